@@ -4,14 +4,23 @@ from datetime import datetime, date, timedelta
 import json
 import pandas as pd
 import io
+import os
+import tempfile
+import time
 
 # Importações da arquitetura modularizada
 from database.init_db import init_db
-from database.models import add_user, list_users, add_reminder, list_reminders, get_user_by_id, update_user, delete_user, get_reminder_by_id, update_reminder, delete_reminder, list_utecs, get_all_roles, get_all_users_ids, get_users_by_utec, get_users_by_role
-from services.reminders_service import process_reminders
-from services.utils import normalize_phone
+from database.models import add_user, add_reminder, get_user_by_id, update_user, delete_user, get_reminder_by_id, update_reminder, delete_reminder, list_utecs, get_all_roles, count_segment, add_reminders_for_segment, PRIORITIES, add_suppressions, list_suppressions, count_suppressions, delete_suppressions, get_delivery_stats, import_users, count_users, search_users, search_reminders, list_users_page, count_reminders, list_reminders_page
+from services.jobs import start_processing_job, get_active_job, list_jobs, request_cancel, JobAlreadyRunning
+from services import recurrence
+from services.export import export_to_path
+from services.simulation import simulate
+from services.suppressions import contact_problems, address_key
+from services.profiling import profiled, profile_dir_from_env
+from contextlib import nullcontext
+from services.utils import normalize_phone, normalize_email
 from services.smtp_service import send_email_smtp # Apenas para teste de configuração
-from services.whatsapp_web import WhatsAppWeb # Apenas para teste de configuração
+from services.whatsapp_web import WhatsAppPool, READY as WA_READY # Apenas para teste de configuração
 from configs.settings import save_settings
 
 # Constantes
@@ -33,9 +42,34 @@ def test_smtp_config(smtp_cfg):
     return send_email_smtp(test_email, subject, body, smtp_cfg)
 
 def test_whatsapp_config():
-    # O serviço de WhatsApp é baseado em Selenium, o que é problemático para um app Streamlit.
-    # Apenas informamos o usuário sobre a necessidade de configuração manual.
-    return False, "O serviço de WhatsApp Web requer configuração manual (leitura de QR Code) e não pode ser testado automaticamente no Streamlit."
+    # Apenas verifica (em modo headless) se o perfil persistente já tem sessão autenticada;
+    # o login em si é feito fora do Streamlit, com `python -m services.whatsapp_web --login`.
+    # Falha se o agendador estiver com o mesmo perfil aberto.
+    wa = WhatsAppPool()
+    state = wa.ensure_started()
+    ready = sum(1 for s in wa.sessions if s.state == WA_READY)
+    details = wa.details
+    wa.close()
+    if state == WA_READY:
+        return True, f"{ready} de {len(wa.sessions)} sessões autenticadas." + (f" {details}" if details else "")
+    return False, details
+
+
+PRIORITY_LABELS = {"urgent": "Urgente", "normal": "Normal", "bulk": "Em massa"}
+
+# Linhas por página nas telas Gerenciar Usuários / Gerenciar Lembretes
+LIST_PAGE_SIZE = 50
+
+# O st.download_button mantém o arquivo inteiro na memória do servidor; acima disso, só pela linha de comando
+EXPORT_DOWNLOAD_MAX_BYTES = 100 * 1024 * 1024
+
+
+def user_option_label(user):
+    return f"{user['name']} — {user['email']}" if user['email'] else user['name']
+
+def user_search_options(query, limit=20):
+    # Opções de seletor a partir da busca textual (evita carregar todos os usuários)
+    return {user_option_label(u): u['id'] for u in search_users(query, limit=limit)}
 
 
 # Streamlit UI
@@ -50,11 +84,14 @@ menu = st.sidebar.selectbox("Menu", [
     "Gerenciar Usuários",
     "Gerenciar Lembretes",
     "Logs de Envio",
+    "Dashboard de Envios",
+    "Exportar Dados",
+    "Lista de Supressão",
     "Processar Lembretes"
 ])
 
 # ---------------- CONFIGURAÇÕES ----------------
-if menu == "Configurações":
+def page_configuracoes():
     st.header("Configurações de envio (SMTP e WhatsApp)")
     
     # 1. Inputs e Botão Salvar dentro do Form
@@ -106,7 +143,7 @@ if menu == "Configurações":
             else:
                 st.error(f"Falha no teste WhatsApp. Detalhes: {meta# ---------------- CADASTRAR USUÁRIO ----------------}")
                                                                
-elif menu == "Cadastrar Usuário":
+def page_cadastrar_usuario():
     st.header("Cadastrar Novo Usuário")
     
     utec_options = list_utecs()
@@ -150,7 +187,7 @@ elif menu == "Cadastrar Usuário":
                 st.error("Nome, E-mail, Função e Local são obrigatórios.")
 
 # ---------------- UPLOAD DE USUÁRIOS (CSV/XLS) ----------------
-elif menu == "Upload de Usuários (CSV/XLS)":
+def page_upload_usuarios():
     st.header("Upload de Usuários em Massa")
     st.info("O arquivo deve conter as colunas: 'name', 'birthdate' (formato YYYY-MM-DD), 'role', 'utec', 'email', 'phone'.")
     
@@ -180,35 +217,47 @@ elif menu == "Upload de Usuários (CSV/XLS)":
             st.dataframe(df.head())
             
             if st.button("Confirmar Cadastro em Massa"):
-                count = 0
+                rows = []
+                rejected = 0
                 for index, row in df.iterrows():
                     try:
-                        # Normalizar dados
-                        birthdate_str = str(row['birthdate'])
+                        # Normalizar dados (células vazias do pandas chegam como NaN)
+                        row = row.where(pd.notna(row), None)
+                        birthdate_str = str(row['birthdate']) if row['birthdate'] is not None else None
                         if birthdate_str and 'T' in birthdate_str: # Tratar caso de datetime vindo do Excel
                             birthdate_str = birthdate_str.split('T')[0]
-                            
-                        user_data = {
-                            "name": row['name'],
-                            "birthdate": birthdate_str if birthdate_str else None,
+                        if birthdate_str and ' ' in birthdate_str: # Timestamp do pandas
+                            birthdate_str = birthdate_str.split(' ')[0]
+
+                        phone = row['phone']
+                        if isinstance(phone, float) and phone.is_integer(): # Telefone lido como número
+                            phone = int(phone)
+
+                        rows.append((index + 2, {
+                            "name": str(row['name']).strip() if row['name'] is not None else None,
+                            "birthdate": birthdate_str,
                             "role": row['role'],
                             "utec": row['utec'],
-                            "email": row['email'],
-                            "phone": normalize_phone(str(row['phone'])) if row['phone'] else None
-                        }
-                        
-                        # Validação básica
-                        if user_data['name'] and user_data['email']:
-                            add_user(user_data)
-                            count += 1
-                        else:
-                            st.warning(f"Linha {index+2} ignorada: Nome ou E-mail ausente.")
-                            
+                            "email": normalize_email(row['email']),
+                            "phone": normalize_phone(str(phone)) if phone is not None else None
+                        }))
                     except Exception as e:
+                        rejected += 1
                         st.error(f"Erro ao processar a linha {index+2}: {e}")
-                        
-                st.success(f"Processamento concluído. {count} usuários cadastrados com sucesso!")
-                st.experimental_rerun()
+
+                # Importação idempotente: reenviar a mesma planilha não duplica usuários
+                summary = import_users(rows)
+                for line, reason in summary["errors"]:
+                    st.warning(f"Linha {line} ignorada: {reason}")
+
+                # Contatos com formato inválido vão para a lista de supressão (o usuário é importado)
+                suppressed = add_suppressions([p for _, data in rows for p in contact_problems(data)], source="import")
+                if suppressed:
+                    st.info(f"{suppressed} e-mails/telefones inválidos adicionados à lista de supressão.")
+                st.success(
+                    f"Processamento concluído. {summary['inserted']} inseridos, {summary['updated']} atualizados, "
+                    f"{summary['unchanged']} inalterados, {summary['duplicates']} repetidos, {summary['rejected'] + rejected} rejeitados."
+                )
                 
         except Exception as e:
             st.error(f"Erro ao ler o arquivo: {e}")
@@ -252,43 +301,54 @@ elif menu == "Upload de Usuários (CSV/XLS)":
                 add_user(user_data)
                 st.success(f"Usuário {name} cadastrado com sucesso no local {utec}!")
       # ---------------- CRIAR LEMBRETE ----------------
-elif menu == "Criar Lembrete":
+def page_criar_lembrete():
     st.header("Criar Novo Lembrete")
     
-    users = list_users()
-    user_options = {u['name']: u['id'] for u in users}
     utec_options = list_utecs()
     role_options = get_all_roles()
     
-    if not users:
+    if not count_users():
         st.warning("Nenhum usuário cadastrado. Cadastre um usuário primeiro.")
     else:
+        # Busca fora do form para atualizar as opções a cada digitação
+        user_query = st.text_input("Buscar usuário (nome, e-mail, telefone, UTEC ou função)")
+        user_options = user_search_options(user_query)
+
+        # Destinatário e canal ficam fora do form para a contagem acompanhar cada filtro
+        recipient_type = st.radio("Destinatário", ["Usuário Específico", "Segmento"])
+        channel = st.selectbox("Canal de Envio", ["email", "whatsapp", "both"])
+
+        segment = None
+        if recipient_type == "Segmento":
+            # Filtros combináveis (AND); nenhum filtro = todos os usuários com contato no canal
+            col_a, col_b, col_c = st.columns(3)
+            with col_a:
+                selected_utecs = st.multiselect("Locais (UTEC)", utec_options)
+            with col_b:
+                selected_roles = st.multiselect("Funções", role_options)
+            with col_c:
+                month_names = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho",
+                               "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+                birth_month = st.selectbox("Mês de aniversário", ["Qualquer"] + month_names)
+            segment = {
+                "utecs": selected_utecs,
+                "roles": selected_roles,
+                "birth_month": month_names.index(birth_month) + 1 if birth_month != "Qualquer" else None,
+                "channel": channel,
+            }
+            segment_size = count_segment(**segment)
+            st.info(f"O lembrete será enviado para {segment_size} usuários.")
+
         with st.form("reminder_form"):
             
-            # Opções de seleção de destinatários
-            recipient_type = st.radio("Destinatário", ["Usuário Específico", "Todos os Usuários", "Por Local (UTEC)", "Por Função"])
-            
             user_id = None
             
             if recipient_type == "Usuário Específico":
-                selected_user_name = st.selectbox("Selecione o Usuário", list(user_options.keys()))
-                user_id = user_options[selected_user_name]
-                
-            elif recipient_type == "Todos os Usuários":
-                st.info("O lembrete será enviado para todos os usuários cadastrados.")
-                user_id = -1 # Marcador para todos
-                
-            elif recipient_type == "Por Local (UTEC)":
-                selected_utec = st.selectbox("Selecione o Local (UTEC)", utec_options)
-                users_in_utec = get_users_by_utec(selected_utec)
-                st.info(f"O lembrete será enviado para {len(users_in_utec)} usuários em {selected_utec}.")
-                user_id = -2 # Marcador para UTEC
-                
-            elif recipient_type == "Por Função":
-                selected_role = st.selectbox("Selecione a Função", role_options)
-                users_in_role = get_users_by_role(selected_role)
-                st.info(f"O lembrete será enviado para {len(users_in_role)} usuários com a função {selected_role}.")
-                user_id = -3 # Marcador para Função
+                if user_options:
+                    selected_user_name = st.selectbox("Selecione o Usuário", list(user_options.keys()))
+                    user_id = user_options[selected_user_name]
+                else:
+                    st.info("Digite no campo de busca acima para encontrar o usuário.")
             
             title = st.text_input("Título do Lembrete", max_chars=100)
             description = st.text_area("Descrição")
@@ -300,71 +360,78 @@ elif menu == "Criar Lembrete":
                 remind_time = st.time_input("Hora do Lembrete", value=(datetime.now() + timedelta(minutes=5)).time())
             
             remind_at = datetime.combine(remind_date, remind_time).isoformat(sep=' ', timespec='minutes')
-            
-            channel = st.selectbox("Canal de Envio", ["email", "whatsapp", "both"])
+
+            # Envios em massa entram por padrão na faixa "bulk", que não atrasa lembretes individuais
+            priority = st.selectbox("Prioridade", PRIORITIES, index=PRIORITIES.index("bulk" if segment else "normal"),
+                                    format_func=PRIORITY_LABELS.get)
+
+            # Recorrência: uma única linha por usuário, avançada a cada envio
+            with st.expander("Repetição"):
+                repeat = st.selectbox("Repetir", ["Não repete", "Diariamente", "Semanalmente", "Mensalmente"])
+                repeat_interval = st.number_input("A cada (dias/semanas/meses)", min_value=1, value=1)
+                weekday_names = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+                repeat_weekdays = st.multiselect("Dias da semana (semanal)", weekday_names, default=[weekday_names[remind_date.weekday()]])
+                repeat_day = st.number_input("Dia do mês (mensal)", min_value=1, max_value=31, value=remind_date.day)
+                repeat_until = st.date_input("Termina em (opcional)", value=None, min_value=date.today())
+                repeat_count = st.number_input("Número de ocorrências (0 = sem limite)", min_value=0, value=0)
             
             submitted = st.form_submit_button("Agendar Lembrete")
             if submitted:
-                if title and description and user_id is not None:
-                    
-                    # Lógica para agendar o lembrete
-                    if user_id > 0: # Usuário Específico
-                        reminder_data = {
-                            "user_id": user_id,
-                            "title": title,
-                            "description": description,
-                            "remind_at": remind_at,
-                            "channel": channel
-                        }
+                recurrence_json = None
+                if repeat != "Não repete":
+                    try:
+                        recurrence_json = recurrence.dumps(recurrence.build_rule(
+                            {"Diariamente": "daily", "Semanalmente": "weekly", "Mensalmente": "monthly"}[repeat],
+                            interval=repeat_interval,
+                            weekdays=[weekday_names.index(d) for d in repeat_weekdays],
+                            day=repeat_day,
+                            until=repeat_until,
+                            count=repeat_count,
+                        ))
+                    except ValueError as e:
+                        st.error(str(e))
+                        st.stop()
+
+                if title and description and (user_id is not None or segment is not None):
+                    reminder_data = {
+                        "user_id": user_id,
+                        "title": title,
+                        "description": description,
+                        "remind_at": remind_at,
+                        "channel": channel,
+                        "recurrence": recurrence_json,
+                        "priority": priority
+                    }
+
+                    if user_id is not None: # Usuário Específico
                         add_reminder(reminder_data)
                         st.success(f"Lembrete '{title}' agendado para {selected_user_name} em {remind_at}.")
-                        
-                    elif user_id == -1: # Todos os Usuários
-                        all_users_ids = get_all_users_ids()
-                        for uid in all_users_ids:
-                            reminder_data = {
-                                "user_id": uid,
-                                "title": title,
-                                "description": description,
-                                "remind_at": remind_at,
-                                "channel": channel
-                            }
-                            add_reminder(reminder_data)
-                        st.success(f"Lembrete '{title}' agendado para TODOS os {len(all_users_ids)} usuários em {remind_at}.")
-                        
-                    elif user_id == -2: # Por Local (UTEC)
-                        for user in users_in_utec:
-                            reminder_data = {
-                                "user_id": user['id'],
-                                "title": title,
-                                "description": description,
-                                "remind_at": remind_at,
-                                "channel": channel
-                            }
-                            add_reminder(reminder_data)
-                        st.success(f"Lembrete '{title}' agendado para {len(users_in_utec)} usuários em {selected_utec} em {remind_at}.")
-                        
-                    elif user_id == -3: # Por Função
-                        for user in users_in_role:
-                            reminder_data = {
-                                "user_id": user['id'],
-                                "title": title,
-                                "description": description,
-                                "remind_at": remind_at,
-                                "channel": channel
-                            }
-                            add_reminder(reminder_data)
-                        st.success(f"Lembrete '{title}' agendado para {len(users_in_role)} usuários com a função {selected_role} em {remind_at}.")
+
+                    else: # Segmento
+                        total = add_reminders_for_segment(reminder_data, **segment)
+                        st.success(f"Lembrete '{title}' agendado para {total} usuários em {remind_at}.")
                         
                 else:
                     st.error("Título, Descrição e Seleção de Destinatário são obrigatórios."# ---------------- GERENCIAR USUÁRIOS ----------------
-elif menu == "Gerenciar Usuários":
+def page_gerenciar_usuarios():
     st.header("Gerenciar Usuários Cadastrados")
     
-    users = list_users()
-    if not users:
+    total_users = count_users()
+    if not total_users:
         st.info("Nenhum usuário cadastrado.")
         st.stop()
+
+    # Busca por prefixo (FTS5) ou, sem busca, a listagem paginada; nunca a tabela inteira
+    query = st.text_input("Buscar usuário (nome, e-mail, telefone, UTEC ou função)")
+    if query:
+        users = search_users(query, limit=LIST_PAGE_SIZE)
+    else:
+        pages = -(-total_users // LIST_PAGE_SIZE)
+        page = st.number_input(f"Página (de {pages}, {total_users} usuários)", min_value=1, max_value=pages, value=1)
+        users = list_users_page(page, LIST_PAGE_SIZE)
+    if not users:
+        st.info("Nenhum usuário encontrado.")
+        st.stop()
         
     # Converte para DataFrame para seleção
     import pandas as pd
@@ -375,7 +442,7 @@ elif menu == "Gerenciar Usuários":
     
     # Seleção para Edição/Exclusão
     user_ids = df_users.index.tolist()
-    selected_id = st.selectbox("Selecione o ID do Usuário para Editar/Excluir", user_ids)
+    selected_id = st.selectbox("Selecione o ID do Usuário para Editar/Excluir", user_ids, format_func=lambda uid: f"{uid} - {df_users.loc[uid, 'name']}")
     
     if selected_id:
         user_to_edit = get_user_by_id(selected_id)
@@ -438,18 +505,32 @@ elif menu == "Gerenciar Usuários":
                     st.warning(f"Usuário (ID: {selected_id}) excluído com sucesso!")
                     st.experimental_rerun()
 # ---------------- GERENCIAR LEMBRETES ----------------
-elif menu == "Gerenciar Lembretes":
+def page_gerenciar_lembretes():
     st.header("Gerenciar Lembretes Agendados")
     
-    reminders = list_reminders()
-    if not reminders:
+    total_reminders = count_reminders()
+    if not total_reminders:
         st.info("Nenhum lembrete agendado.")
         st.stop()
+
+    # Busca por prefixo (FTS5) em título e descrição ou, sem busca, a listagem paginada
+    query = st.text_input("Buscar lembrete (título ou descrição)")
+    if query:
+        reminders = search_reminders(query, limit=LIST_PAGE_SIZE)
+    else:
+        pages = -(-total_reminders // LIST_PAGE_SIZE)
+        page = st.number_input(f"Página (de {pages}, {total_reminders} lembretes)", min_value=1, max_value=pages, value=1)
+        reminders = list_reminders_page(page, LIST_PAGE_SIZE)
+    if not reminders:
+        st.info("Nenhum lembrete encontrado.")
+        st.stop()
         
     # Converte para DataFrame para seleção
     import pandas as pd
     df_reminders = pd.DataFrame([dict(r) for r in reminders])
     df_reminders = df_reminders.set_index('id')
+    df_reminders['recurrence'] = df_reminders['recurrence'].map(lambda v: recurrence.describe(recurrence.loads(v)))
+    df_reminders['priority'] = df_reminders['priority'].map(lambda v: PRIORITY_LABELS.get(v or 'normal', v))
     
     st.dataframe(df_reminders)
     
@@ -462,13 +543,20 @@ elif menu == "Gerenciar Lembretes":
         
         st.subheader(f"Editar Lembrete ID: {selected_id} - {reminder_to_edit['title']}")
         
-        users = list_users()
-        user_options = {u['name']: u['id'] for u in users}
-        current_user_name = get_user_by_id(reminder_to_edit['user_id'])['name'] if reminder_to_edit['user_id'] else None
+        current_user = get_user_by_id(reminder_to_edit['user_id']) if reminder_to_edit['user_id'] else None
+        user_query = st.text_input("Buscar outro usuário")
+        user_options = user_search_options(user_query)
+        current_user_name = None
+        if current_user:
+            current_user_name = user_option_label(current_user)
+            user_options = {current_user_name: current_user['id'], **user_options}
         
         with st.form("edit_reminder_form"):
             
             # Usuário
+            if not user_options:
+                st.error("Usuário do lembrete não encontrado. Busque um usuário acima.")
+                st.stop()
             selected_user_name = st.selectbox("Usuário", list(user_options.keys()), index=list(user_options.keys()).index(current_user_name) if current_user_name else 0)
             user_id = user_options[selected_user_name]
             
@@ -493,6 +581,8 @@ elif menu == "Gerenciar Lembretes":
             remind_at = datetime.combine(remind_date, remind_time).isoformat(sep=' ', timespec='minutes')
             
             channel = st.selectbox("Canal de Envio", ["email", "whatsapp", "both"], index=["email", "whatsapp", "both"].index(reminder_to_edit['channel']))
+            priority = st.selectbox("Prioridade", PRIORITIES, index=PRIORITIES.index(reminder_to_edit['priority'] or "normal"),
+                                    format_func=PRIORITY_LABELS.get)
             
             col_edit, col_delete = st.columns(2)
             
@@ -504,7 +594,8 @@ elif menu == "Gerenciar Lembretes":
                             "title": title,
                             "description": description,
                             "remind_at": remind_at,
-                            "channel": channel
+                            "channel": channel,
+                            "priority": priority
                         }
                         update_reminder(selected_id, reminder_data)
                         st.success(f"Lembrete '{title}' (ID: {selected_id}) atualizado com sucesso!")
@@ -519,7 +610,7 @@ elif menu == "Gerenciar Lembretes":
                     st.experimental_rerun()
 
 # ---------------- LOGS DE ENVIO ----------------
-elif menu == "Logs de Envio":
+def page_logs_envio():
     st.header("Logs de Envio")
     # A função list_logs não foi implementada no models.py, mas o log está na tabela sent_log.
     # Para fins de demonstração, vamos ler diretamente do banco de dados (reutilizando a conexão).
@@ -536,8 +627,152 @@ elif menu == "Logs de Envio":
     else:
         st.info("Nenhum log de envio registrado.")
 
+# ---------------- LISTA DE SUPRESSÃO ----------------
+def page_lista_supressao():
+    st.header("Lista de Supressão")
+    st.info("Contatos que não são mais tentados no envio: inválidos na importação, e-mails recusados pelo servidor (5xx) e números sem WhatsApp. Remova uma entrada para voltar a enviar para o contato.")
+
+    counts = count_suppressions()
+    col1, col2 = st.columns(2)
+    col1.metric("E-mails", counts.get("email", 0))
+    col2.metric("WhatsApp", counts.get("whatsapp", 0))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        channel_filter = st.selectbox("Canal", ["Todos", "email", "whatsapp"])
+    with col2:
+        address_filter = st.text_input("Buscar endereço/telefone")
+    entries = list_suppressions(None if channel_filter == "Todos" else channel_filter, address_filter)
+
+    if entries:
+        df_suppressions = pd.DataFrame([dict(e) for e in entries])
+        st.dataframe(df_suppressions)
+        selected = st.multiselect(
+            "Selecione as entradas para remover",
+            [(e['channel'], e['address']) for e in entries],
+            format_func=lambda key: f"{key[0]}: {key[1]}",
+        )
+        if st.button("Remover selecionadas", disabled=not selected):
+            delete_suppressions(selected)
+            st.success(f"{len(selected)} entradas removidas.")
+            st.experimental_rerun()
+    else:
+        st.info("Nenhuma entrada encontrada.")
+
+    with st.expander("Adicionar manualmente"):
+        with st.form("suppression_form"):
+            manual_channel = st.selectbox("Canal", ["email", "whatsapp"])
+            manual_address = st.text_input("E-mail ou telefone")
+            manual_reason = st.text_input("Motivo", value="Adicionado manualmente")
+            if st.form_submit_button("Adicionar"):
+                key = address_key(manual_channel, manual_address)
+                if key:
+                    add_suppressions([(manual_channel, key, manual_reason)])
+                    st.success(f"{key} adicionado à lista de supressão.")
+                else:
+                    st.error("Informe o e-mail ou telefone.")
+
+# ---------------- EXPORTAR DADOS ----------------
+def page_exportar_dados():
+    st.header("Exportar Dados (CSV / Parquet)")
+    st.info(f"As linhas são lidas do banco em blocos e gravadas direto no arquivo, mas o download pela página carrega o arquivo gerado na memória (limite de {EXPORT_DOWNLOAD_MAX_BYTES // (1024 * 1024)} MB). Para exportações maiores use a linha de comando: `python -m services.export <dados> --out arquivo`.")
+
+    kind_label = st.selectbox("Dados", ["Usuários", "Lembretes", "Logs de Envio"])
+    kind = {"Usuários": "users", "Lembretes": "reminders", "Logs de Envio": "logs"}[kind_label]
+    fmt = st.radio("Formato", ["csv", "parquet"], horizontal=True)
+
+    filters = {}
+    if kind == "users":
+        filters["utec"] = st.selectbox("Local (UTEC)", ["Todos"] + list_utecs())
+        filters["role"] = st.selectbox("Função", ["Todas"] + get_all_roles())
+        filters["search"] = st.text_input("Busca (nome, e-mail, telefone...)")
+        filters = {k: v for k, v in filters.items() if v not in ("Todos", "Todas", "")}
+    else:
+        col_start, col_end = st.columns(2)
+        with col_start:
+            filters["start"] = st.date_input("De", value=None)
+        with col_end:
+            filters["end"] = st.date_input("Até", value=None)
+        if kind == "reminders":
+            sent_label = st.selectbox("Situação", ["Todos", "Pendentes", "Enviados"])
+            filters["sent"] = {"Todos": None, "Pendentes": 0, "Enviados": 1}[sent_label]
+            filters["search"] = st.text_input("Busca (título ou descrição)") or None
+        else:
+            filters["channel"] = st.selectbox("Canal", ["Todos", "email", "whatsapp", "birthday"])
+            success_label = st.selectbox("Resultado", ["Todos", "Sucesso", "Falha"])
+            filters["success"] = {"Todos": None, "Sucesso": 1, "Falha": 0}[success_label]
+            filters["utec"] = st.selectbox("Local (UTEC)", ["Todos"] + list_utecs())
+            filters = {k: (None if v == "Todos" else v) for k, v in filters.items()}
+        filters = {k: (v.isoformat() if isinstance(v, date) else v) for k, v in filters.items()}
+
+    if st.button("Gerar arquivo"):
+        # Nome único no disco (duas exportações no mesmo segundo não se sobrescrevem); o nome
+        # com data e hora fica só para o download
+        with tempfile.NamedTemporaryFile(prefix=f"gtr_{kind}_", suffix=f".{fmt}", delete=False) as tmp:
+            export_path = tmp.name
+        file_name = f"gtr_{kind}_{datetime.now():%Y%m%d%H%M%S}.{fmt}"
+        try:
+            total = export_to_path(kind, export_path, fmt, **filters)
+            size = os.path.getsize(export_path)
+            if size > EXPORT_DOWNLOAD_MAX_BYTES:
+                st.error(f"{total} linhas exportadas, mas o arquivo ({size // (1024 * 1024)} MB) excede o limite de download da página. Use `python -m services.export`.")
+            else:
+                with open(export_path, "rb") as f:
+                    data = f.read()
+                st.success(f"{total} linhas exportadas.")
+                st.download_button("Baixar arquivo", data, file_name=file_name,
+                                   mime="text/csv" if fmt == "csv" else "application/octet-stream")
+        except RuntimeError as e:
+            st.error(str(e))
+        finally:
+            # O conteúdo já está com o download_button; o arquivo temporário não é mais necessário
+            if os.path.exists(export_path):
+                os.remove(export_path)
+
+# ---------------- DASHBOARD DE ENVIOS ----------------
+def page_dashboard_envios():
+    st.header("Dashboard de Envios")
+    # Lê apenas a tabela agregada delivery_stats (mantida incrementalmente), nunca o sent_log inteiro
+    col_start, col_end = st.columns(2)
+    with col_start:
+        start_day = st.date_input("De", value=date.today() - timedelta(days=30))
+    with col_end:
+        end_day = st.date_input("Até", value=date.today())
+
+    stats = get_delivery_stats(start_day.isoformat(), end_day.isoformat())
+    if not stats:
+        st.info("Nenhum envio registrado no período.")
+        st.stop()
+
+    df_stats = pd.DataFrame([dict(s) for s in stats])
+    df_stats['utec'] = df_stats['utec'].replace('', 'Sem UTEC')
+    # Envios pulados (contato suprimido ou ausente) não foram tentados: ficam fora das falhas e da taxa
+    skipped = int(df_stats.loc[df_stats['skipped'] == 1, 'count'].sum())
+    df_stats = df_stats[df_stats['skipped'] == 0]
+    total = int(df_stats['count'].sum())
+    failed = int(df_stats.loc[df_stats['success'] == 0, 'count'].sum())
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Envios", total)
+    col2.metric("Falhas", failed)
+    col3.metric("Taxa de falha", f"{(failed / total * 100) if total else 0:.1f}%")
+    col4.metric("Pulados (suprimidos/sem contato)", skipped)
+
+    st.subheader("Envios por dia e canal")
+    st.line_chart(df_stats.pivot_table(index='day', columns='channel', values='count', aggfunc='sum', fill_value=0))
+
+    st.subheader("Taxa de falha por dia (%)")
+    per_day = df_stats.pivot_table(index='day', columns='success', values='count', aggfunc='sum', fill_value=0)
+    per_day = per_day.reindex(columns=[0, 1], fill_value=0)
+    st.line_chart((per_day[0] / per_day.sum(axis=1) * 100).rename("falhas (%)"))
+
+    st.subheader("Envios por UTEC")
+    per_utec = df_stats.pivot_table(index='utec', columns='success', values='count', aggfunc='sum', fill_value=0)
+    per_utec = per_utec.reindex(columns=[0, 1], fill_value=0).rename(columns={0: "falha", 1: "sucesso"})
+    st.bar_chart(per_utec)
+
 # ---------------- PROCESSAR LEMBRETES ----------------
-elif menu == "Processar Lembretes":
+def page_processar_lembretes():
     st.header("Processamento de Lembretes e Aniversários")
     st.warning("Este processo deve ser executado periodicamente (ex: via cron job ou serviço externo) para enviar as mensagens. A execução manual aqui é apenas para teste.")
     
@@ -553,20 +788,108 @@ elif menu == "Processar Lembretes":
     
 
     
-    if st.button("Executar Processamento de Envio"):
-        st.info("Iniciando processamento...")
-        
-        # O serviço de WhatsApp Web (Selenium) não é adequado para ser executado dentro do Streamlit
-        # em um ambiente de nuvem sem um navegador configurado.
-        # Vamos simular o dry_run para evitar falhas de ambiente.
-        
-        # logs = check_and_send_pending(smtp_cfg, dry_run=False) # Versão real
-        logs = process_reminders(smtp_cfg, dry_run=True) # Versão Dry Run para Streamlit
-        
-        if logs:
-            st.success(f"Processamento concluído. {len(logs)} ações registradas (Dry Run).")
-            st.dataframe([dict(l) for l in logs])
-        else:
-            st.info("Processamento concluído. Nenhuma mensagem pendente encontrada.")
-            
-        st.warning("A execução real (sem Dry Run) do WhatsApp Web (Selenium) pode falhar em ambientes de nuvem. Considere migrar para a Cloud API ou um serviço de envio mais robusto.")
\ No newline at end of file
+    # O processamento roda em um processo separado (services/jobs.py); a página só acompanha
+    # o progresso gravado na tabela jobs, então recarregar a aba não interrompe o envio.
+    active_job = get_active_job()
+
+    if active_job:
+        st.subheader(f"Job #{active_job['id']} — {active_job['status']}" + (" (Dry Run)" if active_job['dry_run'] else ""))
+        # Sem barra de progresso: "processed" conta envios (um lembrete gera um por canal,
+        # um resumo agrupa vários lembretes) e "due" conta lembretes, não são comparáveis
+        st.caption(f"{active_job['processed']} envios registrados · {active_job['due']} lembretes vencidos no início")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Enviados", active_job['sent'])
+        col2.metric("Falhas", active_job['failed'])
+        col3.metric("Ignorados", active_job['skipped'])
+        if active_job['last_error']:
+            st.error(f"Último erro: {active_job['last_error']}")
+
+        if active_job['cancel_requested']:
+            st.info("Cancelamento solicitado; aguardando o envio em andamento terminar.")
+        elif st.button("Cancelar processamento", type="primary"):
+            request_cancel(active_job['id'])
+
+        time.sleep(1)
+        st.experimental_rerun()
+    else:
+        dry_run = st.checkbox("Dry Run (não envia, mas registra no log e marca os lembretes como enviados)", value=True)
+        batch_email = st.checkbox("Agrupar e-mails idênticos (envio em lote)")
+        digest = st.checkbox("Resumo por usuário (um envio com todos os lembretes vencidos)")
+        if not dry_run:
+            st.warning("A execução real do WhatsApp Web (Selenium) pode falhar em ambientes de nuvem. Considere migrar para a Cloud API ou um serviço de envio mais robusto.")
+
+        if st.button("Executar Processamento de Envio"):
+            try:
+                job_id = start_processing_job(smtp_cfg, dry_run=dry_run, batch_email=batch_email, digest=digest)
+            except JobAlreadyRunning as e:
+                # Outro processamento (ex: o agendador) começou depois que a página foi carregada
+                st.warning(str(e))
+            else:
+                st.info(f"Processamento iniciado (job #{job_id}).")
+                st.experimental_rerun()
+
+        # Simulação sobre uma cópia em memória do banco: nada é enviado nem gravado
+        with st.expander("Simular execução (sem alterar o banco)"):
+            col1, col2 = st.columns(2)
+            with col1:
+                sim_date = st.date_input("Data simulada", value=date.today())
+                email_latency = st.number_input("Latência SMTP (s/mensagem)", min_value=0.0, value=0.5)
+                email_per_minute = st.number_input("Limite SMTP (mensagens/min, 0 = sem limite)", min_value=0, value=0)
+            with col2:
+                sim_time = st.time_input("Hora simulada", value=datetime.now().time())
+                whatsapp_latency = st.number_input("Latência WhatsApp (s/envio)", min_value=0.0, value=5.0)
+                whatsapp_per_minute = st.number_input("Limite WhatsApp (envios/min por sessão, 0 = sem limite)", min_value=0, value=0)
+            whatsapp_sessions = st.number_input("Sessões do WhatsApp", min_value=1, value=1)
+
+            if st.button("Simular"):
+                with st.spinner("Simulando..."):
+                    report = simulate(
+                        at=datetime.combine(sim_date, sim_time),
+                        smtp_cfg={"batch_max_recipients": int(os.environ.get("GTR_SMTP_BATCH_MAX", 50))},
+                        batch_email=batch_email, digest=digest,
+                        email_latency=email_latency, whatsapp_latency=whatsapp_latency,
+                        whatsapp_sessions=whatsapp_sessions,
+                        email_per_minute=email_per_minute or None, whatsapp_per_minute=whatsapp_per_minute or None,
+                    )
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Tempo projetado", str(timedelta(seconds=round(report["projected_seconds"]))))
+                col2.metric("Mensagens de e-mail", report["channels"]["email"]["messages"])
+                col3.metric("Envios por WhatsApp", report["channels"]["whatsapp"]["messages"])
+                for ch, label in (("email", "SMTP"), ("whatsapp", "WhatsApp")):
+                    delay = report["channels"][ch]["rate_limit_delay_seconds"]
+                    if delay:
+                        st.warning(f"O limite do {label} acrescenta {timedelta(seconds=round(delay))} à execução.")
+                st.json(report)
+
+    jobs = list_jobs()
+    if jobs:
+        st.subheader("Execuções recentes")
+        st.dataframe(
+            pd.DataFrame([dict(j) for j in jobs]).set_index('id')[
+                ['kind', 'status', 'dry_run', 'created_at', 'finished_at', 'due', 'processed', 'sent', 'failed', 'skipped', 'last_error']
+            ]
+        )
+        last_finished = next((j for j in jobs if j['summary']), None)
+        if last_finished:
+            with st.expander(f"Métricas do job #{last_finished['id']}"):
+                st.json(json.loads(last_finished['summary']))
+
+PAGES = {
+    "Configurações": page_configuracoes,
+    "Cadastrar Usuário": page_cadastrar_usuario,
+    "Upload de Usuários (CSV/XLS)": page_upload_usuarios,
+    "Criar Lembrete": page_criar_lembrete,
+    "Gerenciar Usuários": page_gerenciar_usuarios,
+    "Gerenciar Lembretes": page_gerenciar_lembretes,
+    "Logs de Envio": page_logs_envio,
+    "Lista de Supressão": page_lista_supressao,
+    "Exportar Dados": page_exportar_dados,
+    "Dashboard de Envios": page_dashboard_envios,
+    "Processar Lembretes": page_processar_lembretes,
+}
+
+# Modo de perfil opcional (GTR_PROFILE_DIR): grava cProfile + relatório SQL da renderização da página.
+# O `with` fecha o perfil também quando a página termina com st.stop() ou st.experimental_rerun()
+# (que interrompem o script com exceção); sem isso o cProfile ficaria ativo no servidor.
+with profiled(f"page-{menu}", profile_dir_from_env()) if profile_dir_from_env() else nullcontext():
+    PAGES[menu]()
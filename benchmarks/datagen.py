@@ -0,0 +1,113 @@
+import random
+import unicodedata
+from datetime import date, datetime, timedelta
+
+from database.models import list_utecs
+
+ROLES = ["Professor Multiplicador", "Coordenador", "Outro"]
+ROLE_WEIGHTS = [80, 15, 5]
+
+FIRST_NAMES = [
+    "Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Heitor", "Isabela", "João",
+    "Karina", "Lucas", "Mariana", "Nathan", "Olívia", "Pedro", "Rafaela", "Samuel", "Tainá", "Vitor",
+]
+LAST_NAMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues", "Almeida",
+    "Nascimento", "Barbosa", "Cavalcanti", "Albuquerque", "Lins", "Melo",
+]
+DDDS = ["81", "81", "81", "87", "83"]
+CHANNELS = ["email", "whatsapp", "both"]
+
+
+def _ascii(text):
+    # Parte local do e-mail só em ASCII ("João" -> "joao"): sem SMTPUTF8 o servidor recusa acentos
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+def generate_users(n, seed=42):
+    # Gera usuários determinísticos (mesma seed -> mesmos dados) no formato aceito por add_user
+    rng = random.Random(seed)
+    utecs = list_utecs()
+    users = []
+    for i in range(n):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        birthdate = date(1960, 1, 1) + timedelta(days=rng.randrange(0, 365 * 45))
+        users.append({
+            "name": f"{first} {last} {i}",
+            "birthdate": birthdate.isoformat(),
+            "role": rng.choices(ROLES, weights=ROLE_WEIGHTS)[0],
+            "utec": rng.choice(utecs),
+            "email": f"{_ascii(first)}.{_ascii(last)}.{i}@example.org",
+            "phone": f"{rng.choice(DDDS)}9{rng.randrange(10**7, 10**8)}",
+        })
+    return users
+
+
+def generate_reminders(user_ids, n, seed=42, due_ratio=0.5, now=None):
+    # due_ratio controla a fração de lembretes já vencidos (processados na próxima execução)
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    reminders = []
+    for i in range(n):
+        if rng.random() < due_ratio:
+            remind_at = now - timedelta(minutes=rng.randrange(1, 60 * 24))
+        else:
+            remind_at = now + timedelta(minutes=rng.randrange(1, 60 * 24 * 30))
+        reminders.append({
+            "user_id": rng.choice(user_ids),
+            "title": f"Reunião pedagógica {i % 50}",
+            "description": "Pauta: planejamento das oficinas do mês.",
+            "remind_at": remind_at.isoformat(sep=' ', timespec='minutes'),
+            "channel": rng.choice(CHANNELS),
+        })
+    return reminders
+
+
+def generate_sent_log(reminders, n, seed=42, failure_rate=0.1, now=None):
+    # Histórico de envios dos últimos 30 dias; `reminders` são pares (id, user_id) já gravados
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    log = []
+    for _ in range(n):
+        reminder_id, user_id = rng.choice(reminders)
+        success = rng.random() >= failure_rate
+        log.append({
+            "user_id": user_id,
+            "reminder_id": reminder_id,
+            "sent_at": (now - timedelta(minutes=rng.randrange(1, 60 * 24 * 30))).isoformat(),
+            "channel": rng.choice(["email", "whatsapp"]),
+            "success": success,
+            "details": "Sent" if success else "[Errno 111] Connection refused",
+        })
+    return log
+
+
+def make_birthdays_today(users, ratio, seed=42, today=None):
+    # Ajusta uma fração dos usuários para fazer aniversário hoje (cenário do passe de aniversários)
+    rng = random.Random(seed)
+    today = today or date.today()
+    for u in users:
+        if rng.random() < ratio:
+            year = int(u["birthdate"][:4])
+            day = 28 if (today.month, today.day) == (2, 29) else today.day
+            u["birthdate"] = date(year, today.month, day).isoformat()
+    return users
+
+
+def populate(conn, users, reminders=(), sent_log=()):
+    # Inserção direta em lote (preparação dos cenários, fora da medição)
+    c = conn.cursor()
+    c.executemany(
+        "INSERT INTO users (name, birthdate, role, utec, email, phone) VALUES (?, ?, ?, ?, ?, ?)",
+        [(u["name"], u["birthdate"], u["role"], u["utec"], u["email"], u["phone"]) for u in users],
+    )
+    c.executemany(
+        "INSERT INTO reminders (user_id, title, description, remind_at, channel, priority) VALUES (?, ?, ?, ?, ?, ?)",
+        [(r["user_id"], r["title"], r["description"], r["remind_at"], r["channel"], r.get("priority", "normal")) for r in reminders],
+    )
+    c.executemany(
+        "INSERT INTO sent_log (user_id, reminder_id, sent_at, channel, success, details) VALUES (?, ?, ?, ?, ?, ?)",
+        [(l["user_id"], l["reminder_id"], l["sent_at"], l["channel"], int(l["success"]), l["details"]) for l in sent_log],
+    )
+    conn.commit()
@@ -0,0 +1,159 @@
+import random
+import socket
+import socketserver
+import threading
+from time import sleep
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        # Respostas curtas e sem buffer: sem TCP_NODELAY o algoritmo de Nagle, somado ao ACK
+        # atrasado do cliente, acrescenta ~40 ms por sessão à medição
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 localhost SMTP sink")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode(errors="replace").strip()
+            verb = cmd[:4].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                if sink.should_fail():
+                    self.reply("550 Mailbox unavailable")
+                else:
+                    recipients.append(cmd[8:].strip(" <>"))
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data == b".\r\n":
+                        break
+                    size += len(data)
+                if sink.latency:
+                    sleep(sink.latency)
+                sink.record(recipients, size)
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Servidor SMTP local em processo que aceita e descarta mensagens.
+
+    Permite simular latência (por mensagem, após o DATA) e taxa de falha (por RCPT).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, seed=42):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _ThreadingSMTPServer((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def smtp_cfg(self):
+        # Configuração no mesmo formato usado por send_email_smtp
+        return {
+            "host": self.host,
+            "port": self.port,
+            "username": "",
+            "password": "",
+            "from_email": "gtr@example.org",
+            "use_tls": False,
+            "batch_max_recipients": 50,
+        }
+
+    def should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def record(self, recipients, size):
+        with self._lock:
+            self.messages += 1
+            self.recipients += len(recipients)
+            self.bytes += size
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeWhatsAppSender:
+    """Substituto do WhatsAppWeb com a mesma interface (start/send/close).
+
+    sessions > 1 imita um WhatsAppPool: process_reminders faz até `size` envios simultâneos.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=42, sessions=1):
+        self.size = sessions
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.messages = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def send(self, number, message):
+        if self.latency:
+            sleep(self.latency)
+        with self._lock:
+            if self._rng.random() < self.failure_rate:
+                return False, "Simulated failure"
+            self.messages += 1
+        return True, "Sent"
+
+    def close(self):
+        pass
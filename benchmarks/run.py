@@ -0,0 +1,263 @@
+"""Cenários de benchmark reprodutíveis.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.run --users 10000 --reminders 10000 --out bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from database import connection
+from database.connection import get_conn
+from database.init_db import init_db, rebuild_search_index
+from database.models import import_users, count_segment, add_reminders_for_segment, list_users, list_reminders, list_utecs, search_users, search_reminders
+from services.reminders_service import process_reminders
+from benchmarks.datagen import generate_users, generate_reminders, generate_sent_log, make_birthdays_today, populate
+from benchmarks.fakes import SMTPSink, FakeWhatsAppSender
+
+
+def fresh_db(workdir, name):
+    # Cada cenário roda sobre um banco novo, isolado do gtr_messages.db real
+    path = os.path.join(workdir, f"{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    connection.DB_PATH = path
+    init_db()
+    return get_conn()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    items = fn()
+    return time.perf_counter() - start, items
+
+
+def scenario_process_reminders(args, workdir):
+    conn = fresh_db(workdir, "process_reminders")
+    users = generate_users(args.users, seed=args.seed)
+    populate(conn, users)
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    populate(conn, [], generate_reminders(user_ids, args.reminders, seed=args.seed, due_ratio=args.due_ratio))
+    conn.close()
+
+    wa = FakeWhatsAppSender(latency=args.wa_latency, failure_rate=args.failure_rate, seed=args.seed, sessions=args.wa_sessions)
+    with SMTPSink(latency=args.smtp_latency, failure_rate=args.failure_rate, seed=args.seed) as sink:
+        smtp_cfg = sink.smtp_cfg()
+        if args.trace_memory:
+            tracemalloc.start()
+        seconds, summary = timed(lambda: process_reminders(smtp_cfg, dry_run=False, wa_sender=wa, batch_email=args.batch_email,
+                                                          digest=args.digest, chunk_size=args.chunk_size))
+        extra = {"smtp_messages": sink.messages, "whatsapp_messages": wa.messages}
+        if args.trace_memory:
+            extra["peak_python_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+    return seconds, sum(summary[k] for k in ("sent", "failed", "skipped")), extra
+
+
+def scenario_bulk_import(args, workdir):
+    fresh_db(workdir, "bulk_import").close()
+    users = generate_users(args.users, seed=args.seed)
+
+    # Mesmo caminho da tela de upload
+    seconds, summary = timed(lambda: import_users(list(enumerate(users, 2))))
+    return seconds, len(users), {"inserted": summary["inserted"]}
+
+
+def scenario_bulk_reimport(args, workdir):
+    fresh_db(workdir, "bulk_reimport").close()
+    users = generate_users(args.users, seed=args.seed)
+    import_users(list(enumerate(users, 2)))
+
+    # Reimportação mensal: mesma planilha com ~2% das linhas alteradas
+    for u in users[::50]:
+        u["role"] = "Coordenador" if u["role"] != "Coordenador" else "Outro"
+    seconds, summary = timed(lambda: import_users(list(enumerate(users, 2))))
+    return seconds, len(users), {"updated": summary["updated"], "unchanged": summary["unchanged"]}
+
+
+def scenario_broadcast_scheduling(args, workdir):
+    conn = fresh_db(workdir, "broadcast_scheduling")
+    populate(conn, generate_users(args.users, seed=args.seed))
+    conn.close()
+    utec = list_utecs()[0]
+
+    # Mesmo caminho da tela "Criar Lembrete" com um segmento por UTEC: prévia (COUNT) + agendamento
+    segment = {"utecs": [utec], "channel": "both"}
+
+    def run():
+        count_segment(**segment)
+        return add_reminders_for_segment({
+            "title": "Comunicado",
+            "description": "Reunião geral na sexta-feira.",
+            "remind_at": datetime.now().isoformat(sep=' ', timespec='minutes'),
+            "channel": "both",
+        }, **segment)
+
+    seconds, items = timed(run)
+    return seconds, items, {"utec": utec}
+
+
+def scenario_birthday_pass(args, workdir):
+    conn = fresh_db(workdir, "birthday_pass")
+    populate(conn, make_birthdays_today(generate_users(args.users, seed=args.seed), args.birthday_ratio, seed=args.seed))
+    conn.close()
+
+    wa = FakeWhatsAppSender(latency=args.wa_latency, failure_rate=args.failure_rate, seed=args.seed, sessions=args.wa_sessions)
+    with SMTPSink(latency=args.smtp_latency, failure_rate=args.failure_rate, seed=args.seed) as sink:
+        seconds, summary = timed(lambda: process_reminders(sink.smtp_cfg(), dry_run=False, wa_sender=wa, chunk_size=args.chunk_size))
+    return seconds, sum(summary[k] for k in ("sent", "failed", "skipped")), {}
+
+
+def scenario_priority_lanes(args, workdir):
+    # Um envio em massa para todos os usuários e alguns lembretes urgentes no mesmo minuto:
+    # mede quanto tempo os urgentes esperam
+    conn = fresh_db(workdir, "priority_lanes")
+    populate(conn, generate_users(args.users, seed=args.seed))
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    remind_at = datetime.now().isoformat(sep=' ', timespec='minutes')
+    broadcast = [{"user_id": uid, "title": "Comunicado", "description": "Reunião geral.", "remind_at": remind_at,
+                  "channel": "whatsapp", "priority": "bulk"} for uid in user_ids]
+    urgent = [{"user_id": uid, "title": "Urgente", "description": "Sala alterada.", "remind_at": remind_at,
+               "channel": "whatsapp", "priority": "urgent"} for uid in user_ids[-10:]]
+    populate(conn, [], broadcast + urgent)
+    conn.close()
+
+    urgent_ids = {row[0] for row in get_conn().execute("SELECT id FROM reminders WHERE priority = 'urgent'")}
+    waits = []
+    start = time.perf_counter()
+
+    def on_result(entry):
+        if entry.get("reminder_id") in urgent_ids:
+            waits.append(time.perf_counter() - start)
+
+    wa = FakeWhatsAppSender(latency=args.wa_latency, failure_rate=args.failure_rate, seed=args.seed, sessions=args.wa_sessions)
+    seconds, summary = timed(lambda: process_reminders({}, dry_run=False, wa_sender=wa, on_result=on_result,
+                                                        chunk_size=args.chunk_size))
+    return seconds, sum(summary[k] for k in ("sent", "failed", "skipped")), {
+        "urgent_max_wait_seconds": round(max(waits), 4) if waits else None,
+    }
+
+
+def scenario_list_pages(args, workdir):
+    conn = fresh_db(workdir, "list_pages")
+    users = generate_users(args.users, seed=args.seed)
+    populate(conn, users)
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    populate(conn, [], generate_reminders(user_ids, args.reminders, seed=args.seed))
+    reminders = conn.execute("SELECT id, user_id FROM reminders").fetchall()
+    populate(conn, [], sent_log=generate_sent_log(reminders, args.reminders, seed=args.seed, failure_rate=args.failure_rate))
+    conn.close()
+
+    # Consultas feitas pelas telas "Gerenciar Usuários", "Gerenciar Lembretes" e "Logs de Envio"
+    def run():
+        rows = [dict(u) for u in list_users()]
+        rows += [dict(r) for r in list_reminders()]
+        conn = get_conn()
+        rows += [dict(l) for l in conn.execute("SELECT * FROM sent_log ORDER BY sent_at DESC")]
+        conn.close()
+        return len(rows)
+
+    seconds, items = timed(run)
+    return seconds, items, {}
+
+
+def scenario_search(args, workdir):
+    conn = fresh_db(workdir, "search")
+    users = generate_users(args.users, seed=args.seed)
+    populate(conn, users)
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    populate(conn, [], generate_reminders(user_ids, args.reminders, seed=args.seed))
+    conn.close()
+    rebuild_search_index()  # a carga direta não passa pelas funções que mantêm o FTS
+
+    # Busca incremental das telas de gerenciamento (uma consulta por tecla digitada)
+    queries = [u["name"][:n] for u in users[:50] for n in (2, 4, 6)] + ["reuni", "pauta"]
+
+    def run():
+        found = 0
+        for q in queries:
+            found += len(search_users(q)) + len(search_reminders(q))
+        return len(queries), found
+
+    seconds, (items, found) = timed(run)
+    # Todas as consultas vêm dos dados gerados: sem resultados, o índice não foi carregado
+    assert found, "a busca não encontrou nenhum resultado"
+    return seconds, items, {"results": found}
+
+
+SCENARIOS = {
+    "process_reminders": scenario_process_reminders,
+    "bulk_import": scenario_bulk_import,
+    "bulk_reimport": scenario_bulk_reimport,
+    "broadcast_scheduling": scenario_broadcast_scheduling,
+    "birthday_pass": scenario_birthday_pass,
+    "priority_lanes": scenario_priority_lanes,
+    "list_pages": scenario_list_pages,
+    "search": scenario_search,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do GTR Automatic Message")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--reminders", type=int, default=1000)
+    parser.add_argument("--due-ratio", type=float, default=0.5)
+    parser.add_argument("--birthday-ratio", type=float, default=0.05)
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="segundos por mensagem no SMTP local")
+    parser.add_argument("--wa-latency", type=float, default=0.0, help="segundos por envio no WhatsApp falso")
+    parser.add_argument("--wa-sessions", type=int, default=1, help="sessões simultâneas do WhatsApp falso")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--batch-email", action="store_true", help="process_reminders com e-mails em lote")
+    parser.add_argument("--digest", action="store_true", help="process_reminders no modo digest")
+    parser.add_argument("--chunk-size", type=int, default=500, help="chunk_size de process_reminders")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="mede o pico de memória Python de process_reminders (tracemalloc; deixa o cenário mais lento)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="repetível; padrão: todos")
+    parser.add_argument("--out", default="bench_output.json")
+    args = parser.parse_args(argv)
+
+    original_db = connection.DB_PATH
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in args.scenario or list(SCENARIOS):
+                seconds, items, extra = SCENARIOS[name](args, workdir)
+                results.append({
+                    "scenario": name,
+                    "seconds": round(seconds, 6),
+                    "items": items,
+                    "items_per_second": round(items / seconds, 2) if seconds else None,
+                    **extra,
+                })
+                print(f"{name:24s} {seconds:10.3f}s {items:10d} itens")
+    finally:
+        connection.DB_PATH = original_db
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "scenario")},
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.out}")
+
+
+if __name__ == "__main__":
+    main()
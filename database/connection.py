@@ -1,8 +1,88 @@
 import sqlite3
+from contextvars import ContextVar
+from time import perf_counter
 
 DB_PATH = "gtr_messages.db"
 
+# Rastreador opcional de instruções SQL (ver services/profiling.py). Quando definido,
+# as conexões criadas por get_conn registram cada instrução com duração e linhas.
+# É por contexto (cada thread começa sem rastreador): o Streamlit renderiza cada sessão
+# na sua própria thread, e uma renderização não pode registrar nem trocar o de outra.
+_statement_tracer = ContextVar("statement_tracer", default=None)
+
+def set_statement_tracer(tracer):
+    previous = _statement_tracer.get()
+    _statement_tracer.set(tracer)
+    return previous
+
+
+class TracedCursor(sqlite3.Cursor):
+    _entry = None
+
+    def _start(self, sql, fn, *args):
+        start = perf_counter()
+        result = fn(*args)
+        elapsed = perf_counter() - start
+        # Para SELECT as linhas são contadas conforme são lidas; para DML usa rowcount
+        rows = 0 if self.description is not None else max(self.rowcount, 0)
+        self._entry = self.connection.tracer.record(sql, elapsed, rows)
+        return result
+
+    def _fetch(self, fn, *args):
+        start = perf_counter()
+        result = fn(*args)
+        if self._entry is not None:
+            self._entry["seconds"] += perf_counter() - start
+            if isinstance(result, list):
+                self._entry["rows"] += len(result)
+            elif result is not None:
+                self._entry["rows"] += 1
+        return result
+
+    def execute(self, sql, parameters=()):
+        return self._start(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._start(sql, super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            raise StopIteration
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    tracer = None
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # Os atalhos conn.execute/executemany do sqlite3 não passam por TracedCursor.execute
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    tracer = _statement_tracer.get()
+    if tracer is not None:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=TracedConnection)
+        conn.tracer = tracer
+        # Callback do próprio SQLite: registra também BEGIN/COMMIT implícitos
+        conn.set_trace_callback(tracer.on_sqlite_trace)
+    else:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    return conn
\ No newline at end of file
+    return conn
@@ -1,9 +1,61 @@
+from services.suppressions import address_key, permanent_failure
+
 from .connection import get_conn
 
+def _add_column_if_missing(c, table, column, decl):
+    # Migração simples para bancos criados antes da coluna existir
+    columns = [row[1] for row in c.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+    return False
+
+def _backfill_suppressions(c):
+    # Falhas permanentes já registradas em sent_log (endereço de e-mail inexistente, número sem
+    # WhatsApp), pela mesma regra do envio (services.suppressions.permanent_failure, que também
+    # aceita o formato antigo do envio simples). O GLOB/LIKE só pré-filtra as linhas.
+    found = {}
+    for row in c.execute('''
+        SELECT l.channel, l.details, l.sent_at, u.email, u.phone
+        FROM sent_log l
+        JOIN users u ON l.user_id = u.id
+        WHERE l.success = 0
+          AND (l.details GLOB '5[0-9][0-9]*' OR l.details GLOB '{*' OR l.details LIKE 'Número inválido no WhatsApp%')
+    '''):
+        # "birthday" registra os dois canais com o mesmo nome
+        channels = ("email", "whatsapp") if row["channel"] == "birthday" else (row["channel"],)
+        for channel in channels:
+            reason = permanent_failure(channel, row["details"])
+            address = address_key(channel, row["email"] if channel == "email" else row["phone"])
+            sent_at = row["sent_at"] or ""
+            if reason and address and sent_at >= found.get((channel, address), ("", ""))[1]:
+                found[(channel, address)] = (reason, sent_at)
+    c.executemany('''
+        INSERT OR IGNORE INTO suppressions (channel, address, reason, source, created_at)
+        VALUES (?, ?, ?, 'sent_log', ?)
+    ''', [(channel, address, reason, sent_at) for (channel, address), (reason, sent_at) in found.items()])
+
+def _rebuild_search_index(c):
+    c.execute("DELETE FROM users_fts")
+    c.execute("INSERT INTO users_fts (rowid, name, email, phone, utec, role) SELECT id, name, email, phone, utec, role FROM users")
+    c.execute("DELETE FROM reminders_fts")
+    c.execute("INSERT INTO reminders_fts (rowid, title, description) SELECT id, title, description FROM reminders")
+
+def rebuild_search_index():
+    """Recria os índices de busca (users_fts, reminders_fts) a partir das tabelas."""
+    conn = get_conn()
+    c = conn.cursor()
+    _rebuild_search_index(c)
+    conn.commit()
+    conn.close()
+
 def init_db():
     conn = get_conn()
     c = conn.cursor()
 
+    # WAL: leituras da interface não bloqueiam (nem são bloqueadas por) um job gravando logs
+    c.execute("PRAGMA journal_mode=WAL")
+
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY,
@@ -16,6 +68,9 @@ def init_db():
         )
     ''')
 
+    # Hash do conteúdo do cadastro, usado pela importação para ignorar linhas inalteradas
+    _add_column_if_missing(c, 'users', 'content_hash', 'TEXT')
+
     c.execute('''
         CREATE TABLE IF NOT EXISTS reminders (
             id INTEGER PRIMARY KEY,
@@ -29,6 +84,17 @@ def init_db():
         )
     ''')
 
+    # Recorrência (JSON, ver services/recurrence.py) e número da ocorrência atual da série
+    _add_column_if_missing(c, 'reminders', 'recurrence', 'TEXT')
+    _add_column_if_missing(c, 'reminders', 'occurrence', 'INTEGER DEFAULT 1')
+
+    # Faixa de prioridade do envio: urgent, normal ou bulk (ver process_reminders)
+    _add_column_if_missing(c, 'reminders', 'priority', "TEXT DEFAULT 'normal'")
+
+    # Seleção dos lembretes vencidos sem varrer a tabela inteira (geral e por faixa)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (sent, remind_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reminders_lane ON reminders (sent, priority, remind_at)")
+
     c.execute('''
         CREATE TABLE IF NOT EXISTS sent_log (
             id INTEGER PRIMARY KEY,
@@ -41,5 +107,128 @@ def init_db():
         )
     ''')
 
+    # Envios pulados sem tentativa (contato suprimido ou ausente): registrados com success = 0,
+    # mas não são falhas de entrega e ficam fora da taxa de falha do dashboard
+    if _add_column_if_missing(c, 'sent_log', 'skipped', 'INTEGER NOT NULL DEFAULT 0'):
+        c.execute("UPDATE sent_log SET skipped = 1 WHERE success = 0 AND (details LIKE 'Suprimido:%' OR details = 'not attempted')")
+
+    # Execuções de processamento em segundo plano (services/jobs.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            dry_run INTEGER DEFAULT 0,
+            options TEXT,
+            pid INTEGER,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat_at TEXT,
+            due INTEGER DEFAULT 0,
+            processed INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            skipped INTEGER DEFAULT 0,
+            last_error TEXT,
+            cancel_requested INTEGER DEFAULT 0,
+            summary TEXT
+        )
+    ''')
+
+    # Índices de busca textual (FTS5), mantidos pelas funções de escrita em models.py
+    fts_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'users_fts'").fetchone()
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            name, email, phone, utec, role,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS reminders_fts USING fts5(
+            title, description,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+
+    # Carga inicial só na criação (banco anterior ao FTS). init_db roda a cada rerun do
+    # Streamlit, então aqui não se conta nem varre as tabelas; depois de gravar direto no
+    # banco, sem as funções de models.py, use rebuild_search_index().
+    if not fts_exists:
+        _rebuild_search_index(c)
+
+    # Filtros de segmento (UTEC / função) da tela "Criar Lembrete"
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_utec ON users (utec)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)")
+
+    # Consulta "aniversário já enviado hoje" por bloco de usuários
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sent_log_user ON sent_log (user_id, channel)")
+
+    # Contadores agregados de envio (dia x canal x UTEC x resultado) para o dashboard.
+    # Tabela derivada do sent_log: sem a coluna skipped (versão anterior) é recriada pelo backfill.
+    if c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'delivery_stats'").fetchone() \
+            and 'skipped' not in [row[1] for row in c.execute("PRAGMA table_info(delivery_stats)")]:
+        c.execute("DROP TRIGGER IF EXISTS trg_sent_log_delivery_stats")
+        c.execute("DROP TABLE delivery_stats")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_stats (
+            day TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            utec TEXT NOT NULL DEFAULT '',
+            success INTEGER NOT NULL,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, channel, utec, success, skipped)
+        )
+    ''')
+
+    # Backfill único a partir dos logs já existentes
+    c.execute("SELECT 1 FROM delivery_stats LIMIT 1")
+    if c.fetchone() is None:
+        c.execute('''
+            INSERT INTO delivery_stats (day, channel, utec, success, skipped, count)
+            SELECT DATE(l.sent_at), COALESCE(l.channel, ''), COALESCE(u.utec, ''), COALESCE(l.success, 0), l.skipped, COUNT(*)
+            FROM sent_log l
+            LEFT JOIN users u ON l.user_id = u.id
+            GROUP BY 1, 2, 3, 4, 5
+        ''')
+
+    # Atualização incremental a cada linha gravada em sent_log
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_sent_log_delivery_stats
+        AFTER INSERT ON sent_log
+        BEGIN
+            INSERT INTO delivery_stats (day, channel, utec, success, skipped, count)
+            VALUES (
+                DATE(NEW.sent_at),
+                COALESCE(NEW.channel, ''),
+                COALESCE((SELECT utec FROM users WHERE id = NEW.user_id), ''),
+                COALESCE(NEW.success, 0),
+                NEW.skipped,
+                1
+            )
+            ON CONFLICT(day, channel, utec, success, skipped) DO UPDATE SET count = count + 1;
+        END
+    ''')
+
+    # Lista de supressão: contatos que não devem mais ser tentados (ver services/suppressions.py)
+    suppressions_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'suppressions'").fetchone()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS suppressions (
+            channel TEXT NOT NULL,
+            address TEXT NOT NULL,
+            reason TEXT,
+            source TEXT,
+            created_at TEXT,
+            PRIMARY KEY (channel, address)
+        )
+    ''')
+
+    # Backfill único (só na criação da tabela, para não recriar entradas removidas pela tela)
+    if not suppressions_exists:
+        _backfill_suppressions(c)
+
     conn.commit()
     conn.close()
\ No newline at end of file
@@ -1,12 +1,47 @@
+import hashlib
+import re
+
+from services.utils import normalize_email
+
 from .connection import get_conn
 from .init_db import init_db # Para garantir que a tabela de locais seja inicializada, se necessário
 
+USER_FIELDS = ('name', 'birthdate', 'role', 'utec', 'email', 'phone')
+
+# Faixas de prioridade dos lembretes, da mais para a menos urgente
+PRIORITIES = ('urgent', 'normal', 'bulk')
+
+def user_content_hash(data):
+    # Hash estável dos campos do cadastro (detecta linhas inalteradas na reimportação)
+    canonical = "\x1f".join("" if data[f] is None else str(data[f]).strip() for f in USER_FIELDS)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+def _sync_users_fts(c, where, params=()):
+    # Regrava as entradas de busca dos usuários selecionados por `where`
+    c.execute(f"DELETE FROM users_fts WHERE rowid IN (SELECT id FROM users WHERE {where})", params)
+    c.execute(f"""
+        INSERT INTO users_fts (rowid, name, email, phone, utec, role)
+        SELECT id, name, email, phone, utec, role FROM users WHERE {where}
+    """, params)
+
+def _sync_reminders_fts(c, where, params=()):
+    c.execute(f"DELETE FROM reminders_fts WHERE rowid IN (SELECT id FROM reminders WHERE {where})", params)
+    c.execute(f"""
+        INSERT INTO reminders_fts (rowid, title, description)
+        SELECT id, title, description FROM reminders WHERE {where}
+    """, params)
+
+def fts_match_query(text):
+    # Cada termo vira um prefixo entre aspas ("ana"* "silv"*), todos obrigatórios
+    terms = re.findall(r"\w+", text or "")
+    return " ".join(f'"{t}"*' for t in terms) or None
+
 def add_user(data: dict):
     conn = get_conn()
     c = conn.cursor()
     c.execute("""
-        INSERT INTO users (name, birthdate, role, utec, email, phone)
-        VALUES (?, ?, ?, ?, ?, ?)
+        INSERT INTO users (name, birthdate, role, utec, email, phone, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (
         data.get('name'),
         data.get('birthdate'),
@@ -14,9 +49,89 @@ def add_user(data: dict):
         data.get('utec'),
         data.get('email'),
         data.get('phone'),
+        user_content_hash({f: data.get(f) for f in USER_FIELDS}),
     ))
+    _sync_users_fts(c, "id = ?", (c.lastrowid,))
+    conn.commit()
+    conn.close()
+
+
+def import_users(rows):
+    """Importa usuários de forma idempotente (upsert).
+
+    Cada linha é associada a um usuário existente pelo e-mail normalizado ou, na falta
+    dele, pelo telefone. Linhas cujo hash de conteúdo não mudou são ignoradas; só as
+    alteradas são atualizadas e só as novas inseridas, em uma única transação. Linhas que
+    repetem o mesmo usuário no arquivo são reduzidas à última (as demais vão para "duplicates").
+    `rows` é uma sequência de (número_da_linha, dict) com os campos de USER_FIELDS
+    (telefone já normalizado). Retorna um resumo com as contagens e os rejeitados.
+    """
+    conn = get_conn()
+    c = conn.cursor()
+
+    # Um único passe sobre a tabela para montar os índices de associação
+    by_email, by_phone, hashes = {}, {}, {}
+    max_id_before = c.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+    c.execute("SELECT id, name, birthdate, role, utec, email, phone, content_hash FROM users ORDER BY id")
+    for row in c:
+        hashes[row['id']] = row['content_hash'] or user_content_hash(row)
+        if row['email']:
+            by_email.setdefault(normalize_email(row['email']), row['id'])
+        if row['phone']:
+            by_phone.setdefault(row['phone'], row['id'])
+
+    summary = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "rejected": 0, "errors": []}
+
+    # 1º passe: associa cada linha ao usuário existente (ou a um novo, pelo e-mail) e junta as
+    # repetições dentro do arquivo. Vale a última linha; as anteriores contam como duplicadas,
+    # então reimportar o mesmo arquivo sempre resulta em "inalterados".
+    latest = {}    # usuário existente (id) ou ("new", e-mail) -> (linha, dados)
+    for line, data in rows:
+        data = {f: data.get(f) for f in USER_FIELDS}
+        if not data['name'] or not data['email']:
+            summary["rejected"] += 1
+            summary["errors"].append((line, "Nome ou E-mail ausente."))
+            continue
+
+        email_key = normalize_email(data['email'])
+        # Repetições dentro do próprio arquivo só são associadas pelo e-mail
+        target = by_email.get(email_key) or (by_phone.get(data['phone']) if data['phone'] else None) or ("new", email_key)
+        if target in latest:
+            summary["duplicates"] += 1
+            summary["errors"].append((latest[target][0], f"Usuário repetido no arquivo (vale a linha {line})."))
+        latest[target] = (line, data)
+
+    # 2º passe: compara com o banco
+    inserts = []
+    updates = {}   # id -> dados
+    for target, (line, data) in latest.items():
+        if isinstance(target, tuple):
+            inserts.append(data)
+            summary["inserted"] += 1
+        elif hashes.get(target) == user_content_hash(data):
+            summary["unchanged"] += 1
+        else:
+            updates[target] = data
+            summary["updated"] += 1
+
+    c.executemany("""
+        INSERT INTO users (name, birthdate, role, utec, email, phone, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [tuple(d[f] for f in USER_FIELDS) + (user_content_hash(d),) for d in inserts])
+    c.executemany("""
+        UPDATE users SET
+            name = ?, birthdate = ?, role = ?, utec = ?, email = ?, phone = ?, content_hash = ?
+        WHERE id = ?
+    """, [tuple(d[f] for f in USER_FIELDS) + (user_content_hash(d), user_id) for user_id, d in updates.items()])
+
+    # Índice de busca: apenas as linhas inseridas e alteradas
+    _sync_users_fts(c, "id > ?", (max_id_before,))
+    for i in range(0, len(updates), 500):
+        ids = list(updates)[i:i + 500]
+        _sync_users_fts(c, f"id IN ({','.join('?' * len(ids))})", ids)
     conn.commit()
     conn.close()
+    return summary
 
 
 def get_user_by_id(user_id):
@@ -32,7 +147,7 @@ def update_user(user_id, data: dict):
     c = conn.cursor()
     c.execute("""
         UPDATE users SET
-            name = ?, birthdate = ?, role = ?, utec = ?, email = ?, phone = ?
+            name = ?, birthdate = ?, role = ?, utec = ?, email = ?, phone = ?, content_hash = ?
         WHERE id = ?
     """, (
         data.get('name'),
@@ -41,8 +156,10 @@ def update_user(user_id, data: dict):
         data.get('utec'),
         data.get('email'),
         data.get('phone'),
+        user_content_hash({f: data.get(f) for f in USER_FIELDS}),
         user_id
     ))
+    _sync_users_fts(c, "id = ?", (user_id,))
     conn.commit()
     conn.close()
 
@@ -50,9 +167,46 @@ def delete_user(user_id):
     conn = get_conn()
     c = conn.cursor()
     c.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    c.execute("DELETE FROM users_fts WHERE rowid = ?", (user_id,))
     conn.commit()
     conn.close()
 
+def count_users():
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM users")
+    total = c.fetchone()[0]
+    conn.close()
+    return total
+
+def search_users(text, limit=20):
+    # Busca por prefixo em nome, e-mail, telefone, UTEC e função (FTS5)
+    query = fts_match_query(text)
+    if not query:
+        return []
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("""
+        SELECT u.*
+        FROM users_fts f
+        JOIN users u ON u.id = f.rowid
+        WHERE users_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    """, (query, limit))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def list_users_page(page=1, per_page=50):
+    # Uma página da listagem (sem busca), dos cadastros mais recentes para os mais antigos
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT * FROM users ORDER BY id DESC LIMIT ? OFFSET ?", (per_page, (max(page, 1) - 1) * per_page))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
 def list_users():
     conn = get_conn()
     c = conn.cursor()
@@ -127,15 +281,18 @@ def add_reminder(data: dict):
     conn = get_conn()
     c = conn.cursor()
     c.execute("""
-        INSERT INTO reminders (user_id, title, description, remind_at, channel)
-        VALUES (?, ?, ?, ?, ?)
+        INSERT INTO reminders (user_id, title, description, remind_at, channel, recurrence, priority)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (
         data.get('user_id'),
         data.get('title'),
         data.get('description'),
         data.get('remind_at'),
         data.get('channel'),
+        data.get('recurrence'),
+        data.get('priority') or 'normal',
     ))
+    _sync_reminders_fts(c, "id = ?", (c.lastrowid,))
     conn.commit()
     conn.close()
 
@@ -153,7 +310,7 @@ def update_reminder(reminder_id, data: dict):
     c = conn.cursor()
     c.execute("""
         UPDATE reminders SET
-            user_id = ?, title = ?, description = ?, remind_at = ?, channel = ?
+            user_id = ?, title = ?, description = ?, remind_at = ?, channel = ?, priority = ?
         WHERE id = ?
     """, (
         data.get('user_id'),
@@ -161,8 +318,10 @@ def update_reminder(reminder_id, data: dict):
         data.get('description'),
         data.get('remind_at'),
         data.get('channel'),
+        data.get('priority') or 'normal',
         reminder_id
     ))
+    _sync_reminders_fts(c, "id = ?", (reminder_id,))
     conn.commit()
     conn.close()
 
@@ -170,9 +329,53 @@ def delete_reminder(reminder_id):
     conn = get_conn()
     c = conn.cursor()
     c.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+    c.execute("DELETE FROM reminders_fts WHERE rowid = ?", (reminder_id,))
     conn.commit()
     conn.close()
 
+def search_reminders(text, limit=20):
+    # Busca por prefixo em título e descrição (FTS5)
+    query = fts_match_query(text)
+    if not query:
+        return []
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("""
+        SELECT r.*, u.name AS user_name
+        FROM reminders_fts f
+        JOIN reminders r ON r.id = f.rowid
+        LEFT JOIN users u ON r.user_id = u.id
+        WHERE reminders_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    """, (query, limit))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def count_reminders():
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM reminders")
+    total = c.fetchone()[0]
+    conn.close()
+    return total
+
+def list_reminders_page(page=1, per_page=50):
+    # Uma página da listagem (sem busca), dos lembretes mais recentes para os mais antigos
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("""
+        SELECT r.*, u.name AS user_name
+        FROM reminders r
+        LEFT JOIN users u ON r.user_id = u.id
+        ORDER BY r.id DESC
+        LIMIT ? OFFSET ?
+    """, (per_page, (max(page, 1) - 1) * per_page))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
 def list_reminders():
     conn = get_conn()
     c = conn.cursor()
@@ -246,3 +449,137 @@ def get_all_roles():
             unique_roles.add(row['role'])
             
     return sorted(list(unique_roles))
+
+def get_delivery_stats(start_day=None, end_day=None):
+    # Lê apenas os contadores agregados (nunca varre sent_log)
+    conn = get_conn()
+    c = conn.cursor()
+    query = "SELECT day, channel, utec, success, skipped, count FROM delivery_stats WHERE 1 = 1"
+    params = []
+    if start_day:
+        query += " AND day >= ?"
+        params.append(str(start_day))
+    if end_day:
+        query += " AND day <= ?"
+        params.append(str(end_day))
+    query += " ORDER BY day"
+    c.execute(query, params)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def _segment_where(utecs=None, roles=None, birth_month=None, channel=None):
+    # Filtros combinados com AND; listas vazias ou None não filtram
+    where = ["1 = 1"]
+    params = []
+    if utecs:
+        where.append(f"u.utec IN ({','.join('?' * len(utecs))})")
+        params.extend(utecs)
+    if roles:
+        where.append(f"u.role IN ({','.join('?' * len(roles))})")
+        params.extend(roles)
+    if birth_month:
+        # birthdate em ISO (YYYY-MM-DD)
+        where.append("substr(u.birthdate, 6, 2) = ?")
+        params.append(f"{int(birth_month):02d}")
+    if channel == "email":
+        where.append("COALESCE(u.email, '') <> ''")
+    elif channel == "whatsapp":
+        where.append("COALESCE(u.phone, '') <> ''")
+    elif channel == "both":
+        # recebe por pelo menos um dos canais
+        where.append("(COALESCE(u.email, '') <> '' OR COALESCE(u.phone, '') <> '')")
+    return " AND ".join(where), params
+
+def count_segment(**filters):
+    """Número de usuários do segmento (só COUNT, para a prévia da tela)."""
+    where, params = _segment_where(**filters)
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(f"SELECT COUNT(*) FROM users u WHERE {where}", params)
+    total = c.fetchone()[0]
+    conn.close()
+    return total
+
+def iter_segment_ids(chunk_size=1000, **filters):
+    """Gera os ids dos usuários do segmento em blocos de até chunk_size (paginação por id)."""
+    where, params = _segment_where(**filters)
+    last_id = 0
+    while True:
+        conn = get_conn()
+        c = conn.cursor()
+        c.execute(f"SELECT u.id FROM users u WHERE {where} AND u.id > ? ORDER BY u.id LIMIT ?",
+                  (*params, last_id, chunk_size))
+        ids = [row[0] for row in c.fetchall()]
+        conn.close()
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+def add_reminders_for_segment(data: dict, chunk_size=1000, **filters):
+    """Agenda o mesmo lembrete para cada usuário do segmento; retorna quantos foram criados."""
+    conn = get_conn()
+    c = conn.cursor()
+    max_id_before = c.execute("SELECT COALESCE(MAX(id), 0) FROM reminders").fetchone()[0]
+    values = (data.get('title'), data.get('description'), data.get('remind_at'), data.get('channel'),
+              data.get('recurrence'), data.get('priority') or 'bulk')
+    total = 0
+    for ids in iter_segment_ids(chunk_size, **filters):
+        c.executemany("""
+            INSERT INTO reminders (user_id, title, description, remind_at, channel, recurrence, priority)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(uid, *values) for uid in ids])
+        total += len(ids)
+    _sync_reminders_fts(c, "id > ?", (max_id_before,))
+    conn.commit()
+    conn.close()
+    return total
+
+def add_suppressions(entries, source="manual"):
+    """Adiciona entradas (canal, endereço, motivo) à lista de supressão; retorna quantas eram novas."""
+    conn = get_conn()
+    c = conn.cursor()
+    before = c.execute("SELECT COUNT(*) FROM suppressions").fetchone()[0]
+    c.executemany("""
+        INSERT OR IGNORE INTO suppressions (channel, address, reason, source, created_at)
+        VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
+    """, [(channel, address, reason, source) for channel, address, reason in entries])
+    added = c.execute("SELECT COUNT(*) FROM suppressions").fetchone()[0] - before
+    conn.commit()
+    conn.close()
+    return added
+
+def list_suppressions(channel=None, search=None, limit=500):
+    conn = get_conn()
+    c = conn.cursor()
+    query = "SELECT * FROM suppressions WHERE 1 = 1"
+    params = []
+    if channel:
+        query += " AND channel = ?"
+        params.append(channel)
+    if search:
+        query += " AND address LIKE ?"
+        params.append(f"%{search.strip().lower()}%")
+    query += " ORDER BY created_at DESC LIMIT ?"
+    params.append(limit)
+    c.execute(query, params)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def count_suppressions():
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT channel, COUNT(*) FROM suppressions GROUP BY channel")
+    counts = {row[0]: row[1] for row in c.fetchall()}
+    conn.close()
+    return counts
+
+def delete_suppressions(keys):
+    # keys: [(canal, endereço), ...]
+    conn = get_conn()
+    c = conn.cursor()
+    c.executemany("DELETE FROM suppressions WHERE channel = ? AND address = ?", list(keys))
+    conn.commit()
+    conn.close()
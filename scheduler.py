@@ -0,0 +1,135 @@
+"""Processo agendador: executa process_reminders periodicamente e exporta métricas.
+
+Uso:
+    python scheduler.py --interval 60 --metrics-file /var/lib/node_exporter/gtr.prom
+    python scheduler.py --once --dry-run --metrics-port 9108
+
+A configuração SMTP é lida das variáveis de ambiente GTR_SMTP_HOST, GTR_SMTP_PORT,
+GTR_SMTP_USER, GTR_SMTP_PASS, GTR_SMTP_FROM, GTR_SMTP_TLS e GTR_SMTP_BATCH_MAX. Com --profile-dir (ou
+GTR_PROFILE_DIR) cada execução é gravada com cProfile e relatório de instruções SQL.
+
+O navegador do WhatsApp Web fica aberto entre as execuções, com o perfil persistente
+(GTR_WA_PROFILE_DIR); com --wa-sessions N são N navegadores enviando em paralelo. Sem sessão autenticada o agendador continua enviando e-mails e
+tenta de novo a cada execução; o login é feito com `python -m services.whatsapp_web --login`.
+
+Cada execução é registrada na tabela jobs (kind "scheduler") e só começa se nenhum outro
+processamento, do agendador ou da página Processar Lembretes, estiver ativo.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from database.init_db import init_db
+from services.metrics import RunMetrics
+from services.profiling import profiled, profile_dir_from_env
+from services.jobs import claim_job, run_job
+from services.whatsapp_web import WhatsAppPool
+
+
+def smtp_cfg_from_env():
+    return {
+        "host": os.environ.get("GTR_SMTP_HOST", "smtp.gmail.com"),
+        "port": int(os.environ.get("GTR_SMTP_PORT", 587)),
+        "username": os.environ.get("GTR_SMTP_USER", ""),
+        "password": os.environ.get("GTR_SMTP_PASS", ""),
+        "from_email": os.environ.get("GTR_SMTP_FROM", os.environ.get("GTR_SMTP_USER", "")),
+        "use_tls": os.environ.get("GTR_SMTP_TLS", "1") not in ("0", "false", "False"),
+        "batch_max_recipients": int(os.environ.get("GTR_SMTP_BATCH_MAX", 50)),
+    }
+
+
+class MetricsState:
+    def __init__(self):
+        self.totals = RunMetrics()
+        self.last_run = None
+        self._lock = threading.Lock()
+
+    def add_run(self, run):
+        with self._lock:
+            self.totals.merge(run)
+            self.last_run = run
+
+    def render(self):
+        with self._lock:
+            return self.totals.to_prometheus(self.last_run)
+
+
+def serve_metrics(state, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            payload = state.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agendador de envio de lembretes GTR")
+    parser.add_argument("--interval", type=int, default=60, help="segundos entre execuções")
+    parser.add_argument("--once", action="store_true", help="executa uma única vez e sai")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--digest", action="store_true", help="uma mensagem por usuário e canal com todos os lembretes vencidos")
+    parser.add_argument("--batch-email", action="store_true", help="agrupa e-mails idênticos em envelopes com vários destinatários")
+    parser.add_argument("--metrics-file", help="arquivo .prom reescrito após cada execução")
+    parser.add_argument("--metrics-port", type=int, help="expõe /metrics em 127.0.0.1:<porta>")
+    parser.add_argument("--profile-dir", default=profile_dir_from_env(), help="grava cProfile + relatório SQL de cada execução")
+    parser.add_argument("--wa-profile-dir", help="perfil do Chrome do WhatsApp Web (padrão: GTR_WA_PROFILE_DIR)")
+    parser.add_argument("--wa-sessions", type=int, help="sessões do WhatsApp Web usadas em paralelo (padrão: GTR_WA_SESSIONS ou 1)")
+    args = parser.parse_args(argv)
+
+    init_db()
+    smtp_cfg = smtp_cfg_from_env()
+    state = MetricsState()
+    if args.metrics_port:
+        serve_metrics(state, args.metrics_port)
+
+    wa = None if args.dry_run else WhatsAppPool(size=args.wa_sessions, profile_dir=args.wa_profile_dir)
+    try:
+        while True:
+            run = RunMetrics()
+            options = {"batch_email": args.batch_email, "digest": args.digest}
+            # Mesma trava da página Processar Lembretes: com outro processamento ativo a
+            # execução é pulada, para os mesmos lembretes não serem enviados duas vezes
+            job_id = claim_job("scheduler", args.dry_run, options, pid=os.getpid())
+            if job_id is None:
+                print(json.dumps({"skipped": "Já existe um processamento em andamento."}, ensure_ascii=False), flush=True)
+            else:
+                if wa:
+                    with run.stage("whatsapp_start"):
+                        wa.ensure_started()
+                with profiled("process_reminders", args.profile_dir) if args.profile_dir else nullcontext():
+                    status = run_job(job_id, smtp_cfg, args.dry_run, options, metrics=run, wa_sender=wa)
+                state.add_run(run)
+                if args.metrics_file:
+                    state.totals.write_prometheus(args.metrics_file, last_run=run)
+                summary = {"job_id": job_id, "status": status, **run.summary()}
+                if wa:
+                    summary["whatsapp"] = {"state": wa.state, "sessions": wa.size if wa.state == "ready" else 0, "details": wa.details}
+                print(json.dumps(summary, ensure_ascii=False), flush=True)
+
+            if args.once:
+                break
+            time.sleep(args.interval)
+    finally:
+        if wa:
+            wa.close()
+
+
+if __name__ == "__main__":
+    main()
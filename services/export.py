@@ -0,0 +1,186 @@
+"""Exportação em streaming de usuários, lembretes e logs de envio (CSV ou Parquet).
+
+As linhas são lidas do cursor do SQLite em blocos de tamanho fixo e gravadas
+imediatamente, então o uso de memória não depende do tamanho da tabela.
+
+Uso pela linha de comando:
+    python -m services.export logs --format csv --out logs.csv --start 2026-01-01 --success 0
+    python -m services.export users --format parquet --out users.parquet --utec "UTEC PINA"
+"""
+import argparse
+import csv
+import sys
+
+from database.connection import get_conn
+from database.models import fts_match_query
+
+KINDS = ("users", "reminders", "logs")
+FORMATS = ("csv", "parquet")
+INT_COLUMNS = {"id", "user_id", "reminder_id", "sent", "success", "skipped", "occurrence"}
+
+
+def build_query(kind, utec=None, role=None, search=None, sent=None, start=None, end=None, channel=None, success=None):
+    # Mesmos filtros das telas de listagem; filtros não aplicáveis ao tipo são ignorados
+    params = []
+    if kind == "users":
+        sql = "SELECT id, name, birthdate, role, utec, email, phone FROM users u WHERE 1 = 1"
+        if utec:
+            sql += " AND u.utec = ?"
+            params.append(utec)
+        if role:
+            sql += " AND u.role = ?"
+            params.append(role)
+        if fts_match_query(search):
+            sql += " AND u.id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)"
+            params.append(fts_match_query(search))
+        sql += " ORDER BY u.id"
+
+    elif kind == "reminders":
+        sql = """
+            SELECT r.id, r.user_id, u.name AS user_name, r.title, r.description, r.remind_at,
+                   r.channel, r.priority, r.sent, r.recurrence, r.occurrence
+            FROM reminders r
+            LEFT JOIN users u ON r.user_id = u.id
+            WHERE 1 = 1
+        """
+        if sent is not None:
+            sql += " AND r.sent = ?"
+            params.append(int(sent))
+        if start:
+            sql += " AND r.remind_at >= ?"
+            params.append(str(start))
+        if end:
+            sql += " AND r.remind_at < DATE(?, '+1 day')"
+            params.append(str(end))
+        if fts_match_query(search):
+            sql += " AND r.id IN (SELECT rowid FROM reminders_fts WHERE reminders_fts MATCH ?)"
+            params.append(fts_match_query(search))
+        sql += " ORDER BY r.id"
+
+    elif kind == "logs":
+        sql = """
+            SELECT l.id, l.user_id, u.name AS user_name, u.utec, l.reminder_id, l.sent_at,
+                   l.channel, l.success, l.skipped, l.details
+            FROM sent_log l
+            LEFT JOIN users u ON l.user_id = u.id
+            WHERE 1 = 1
+        """
+        if start:
+            sql += " AND l.sent_at >= ?"
+            params.append(str(start))
+        if end:
+            sql += " AND l.sent_at < DATE(?, '+1 day')"
+            params.append(str(end))
+        if channel:
+            sql += " AND l.channel = ?"
+            params.append(channel)
+        if success is not None:
+            sql += " AND l.success = ?"
+            params.append(int(success))
+        if utec:
+            sql += " AND u.utec = ?"
+            params.append(utec)
+        sql += " ORDER BY l.id"
+
+    else:
+        raise ValueError(f"Tipo de exportação inválido: {kind}")
+    return sql, params
+
+
+def iter_chunks(kind, chunk_size=5000, **filters):
+    """Gera (colunas, linhas) em blocos de até chunk_size linhas."""
+    sql, params = build_query(kind, **filters)
+    conn = get_conn()
+    try:
+        c = conn.cursor()
+        c.execute(sql, params)
+        columns = [d[0] for d in c.description]
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield columns, [tuple(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def columns_for(kind):
+    sql, params = build_query(kind)
+    conn = get_conn()
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT * FROM ({sql}) LIMIT 0", params)
+        return [d[0] for d in c.description]
+    finally:
+        conn.close()
+
+
+def export_csv(kind, out, chunk_size=5000, **filters):
+    # out: arquivo texto aberto (newline=""); retorna o número de linhas exportadas
+    writer = csv.writer(out)
+    writer.writerow(columns_for(kind))
+    total = 0
+    for _, rows in iter_chunks(kind, chunk_size, **filters):
+        writer.writerows(rows)
+        total += len(rows)
+    return total
+
+
+def export_parquet(kind, path, chunk_size=5000, **filters):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("A exportação em Parquet requer o pacote pyarrow (pip install pyarrow).")
+
+    columns = columns_for(kind)
+    schema = pa.schema([(col, pa.int64() if col in INT_COLUMNS else pa.string()) for col in columns])
+    total = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for _, rows in iter_chunks(kind, chunk_size, **filters):
+            arrays = []
+            for i, field in enumerate(schema):
+                values = [r[i] for r in rows]
+                if field.type == pa.string():
+                    values = [None if v is None else str(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            total += len(rows)
+    return total
+
+
+def export_to_path(kind, path, fmt="csv", chunk_size=5000, **filters):
+    if fmt == "parquet":
+        return export_parquet(kind, path, chunk_size, **filters)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        return export_csv(kind, f, chunk_size, **filters)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta dados do GTR em CSV ou Parquet")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--out", default="-", help="arquivo de saída ('-' = stdout, apenas CSV)")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--utec")
+    parser.add_argument("--role")
+    parser.add_argument("--search")
+    parser.add_argument("--sent", type=int, choices=(0, 1))
+    parser.add_argument("--start", help="data inicial (YYYY-MM-DD)")
+    parser.add_argument("--end", help="data final, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--channel")
+    parser.add_argument("--success", type=int, choices=(0, 1))
+    args = parser.parse_args(argv)
+
+    filters = {k: getattr(args, k) for k in ("utec", "role", "search", "sent", "start", "end", "channel", "success")}
+    if args.out == "-":
+        if args.format != "csv":
+            parser.error("Parquet exige --out com um arquivo.")
+        total = export_csv(args.kind, sys.stdout, args.chunk_size, **filters)
+    else:
+        total = export_to_path(args.kind, args.out, args.format, args.chunk_size, **filters)
+    print(f"{total} linhas exportadas.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
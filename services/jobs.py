@@ -0,0 +1,257 @@
+"""Execução de process_reminders em um processo worker separado, com progresso na tabela jobs.
+
+A página do Streamlit apenas inicia o job e consulta a tabela; o envio continua mesmo
+que a aba seja recarregada, e pode ser cancelado pela flag cancel_requested.
+
+A tabela jobs também é a trava de execução: só pode haver um job ativo (queued/running)
+por vez, seja da página ou do scheduler.py, para dois processos nunca enviarem os
+mesmos lembretes.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+
+from database import connection
+from database.connection import get_conn
+from services.utils import due_cutoff
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Intervalo mínimo (segundos) entre gravações de progresso / leituras do pedido de cancelamento
+PROGRESS_INTERVAL = 1.0
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Job "queued" sem pid há mais tempo que isso: o processo que o criou morreu antes de iniciar o worker
+STALE_QUEUED_SECONDS = 60
+
+# Processos iniciados por este servidor e ainda não recolhidos (pid -> Popen), ver _reap_children
+_processes = {}
+
+
+class JobAlreadyRunning(RuntimeError):
+    pass
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _count_due(c):
+    c.execute("SELECT COUNT(*) FROM reminders WHERE sent = 0 AND remind_at <= ?", (due_cutoff(),))
+    return c.fetchone()[0]
+
+
+def _reap_children():
+    # Recolhe os workers já encerrados (sem isso ficam <defunct> até o servidor sair) e os
+    # tira do registro. Chamado sempre que a página consulta ou inicia jobs.
+    for pid, process in list(_processes.items()):
+        if process.poll() is not None:
+            _processes.pop(pid, None)
+
+
+def _reap_stale(c):
+    # Jobs ativos cujo processo já morreu (ex: servidor reiniciado) não podem travar novos envios
+    c.execute("SELECT id, pid, created_at FROM jobs WHERE status IN ('queued', 'running')")
+    for job in c.fetchall():
+        if job["pid"]:
+            dead = not _pid_alive(job["pid"])
+        else:
+            dead = (datetime.now() - datetime.fromisoformat(job["created_at"])).total_seconds() > STALE_QUEUED_SECONDS
+        if dead:
+            c.execute("UPDATE jobs SET status = 'failed', finished_at = ?, last_error = ? WHERE id = ?",
+                      (_now(), "Processo do job encerrado inesperadamente.", job["id"]))
+
+
+def claim_job(kind, dry_run=False, options=None, pid=None):
+    """Cria o job somente se nenhum outro estiver ativo; retorna o id ou None.
+
+    A verificação e a inserção rodam na mesma transação BEGIN IMMEDIATE, então dois
+    processos nunca obtêm a trava ao mesmo tempo.
+    """
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        _reap_stale(c)
+        c.execute("""
+            INSERT INTO jobs (kind, status, dry_run, options, created_at, due, pid)
+            SELECT ?, 'queued', ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM jobs WHERE status IN ('queued', 'running'))
+        """, (kind, int(dry_run), json.dumps(options or {}), _now(), _count_due(c), pid))
+        job_id = c.lastrowid if c.rowcount else None
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return job_id
+
+
+def start_processing_job(smtp_cfg, dry_run=False, **options):
+    """Cria o job e inicia o processo de envio; retorna o id do job.
+
+    Levanta JobAlreadyRunning se outro processamento (página ou agendador) estiver ativo.
+    """
+    _reap_children()
+    job_id = claim_job("process_reminders", dry_run, options)
+    if job_id is None:
+        raise JobAlreadyRunning("Já existe um processamento em andamento.")
+    conn = get_conn()
+    c = conn.cursor()
+
+    # Processo Python independente (não herda o estado do servidor do Streamlit). A configuração
+    # SMTP vai pela entrada padrão para a senha não aparecer na linha de comando.
+    process = subprocess.Popen(
+        [sys.executable, "-m", "services.jobs", "--job-id", str(job_id), "--db-path", os.path.abspath(connection.DB_PATH)],
+        cwd=PROJECT_ROOT,
+        stdin=subprocess.PIPE,
+        start_new_session=True,
+    )
+    process.stdin.write(json.dumps({"smtp_cfg": smtp_cfg, "dry_run": dry_run, "options": options}).encode())
+    process.stdin.close()
+    _processes[process.pid] = process
+    c.execute("UPDATE jobs SET pid = ? WHERE id = ?", (process.pid, job_id))
+    conn.commit()
+    conn.close()
+    return job_id
+
+
+def run_job(job_id, smtp_cfg, dry_run, options, db_path=None, metrics=None, **run_kwargs):
+    """Executa o job já criado (no worker, ver main, ou no próprio scheduler.py).
+
+    run_kwargs vão direto para process_reminders (ex: wa_sender do agendador).
+    Retorna o status final.
+    """
+    from services.metrics import RunMetrics
+    from services.reminders_service import process_reminders
+
+    if db_path:
+        connection.DB_PATH = db_path
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, pid = ? WHERE id = ?",
+              (_now(), _now(), os.getpid(), job_id))
+    conn.commit()
+
+    counts = {"processed": 0, "sent": 0, "failed": 0, "skipped": 0}
+    state = {"last_error": None, "last_flush": 0.0, "cancel": False}
+
+    def flush(force=False):
+        if not force and time.monotonic() - state["last_flush"] < PROGRESS_INTERVAL:
+            return
+        state["last_flush"] = time.monotonic()
+        c.execute("""
+            UPDATE jobs SET processed = ?, sent = ?, failed = ?, skipped = ?, last_error = ?, heartbeat_at = ?
+            WHERE id = ?
+        """, (counts["processed"], counts["sent"], counts["failed"], counts["skipped"], state["last_error"], _now(), job_id))
+        conn.commit()
+        state["cancel"] = bool(c.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+
+    def on_result(entry):
+        if "outcome" not in entry:
+            # registros sem canal são erros gerais (ex: falha ao iniciar o WhatsApp)
+            state["last_error"] = entry.get("details")
+        else:
+            counts["processed"] += 1
+            counts[entry["outcome"]] += 1
+            if entry["outcome"] == "failed":
+                state["last_error"] = entry["details"]
+        flush()
+
+    def should_stop():
+        flush()
+        return state["cancel"]
+
+    metrics = metrics if metrics is not None else RunMetrics()
+    try:
+        process_reminders(smtp_cfg, dry_run=dry_run, metrics=metrics,
+                          on_result=on_result, should_stop=should_stop, **options, **run_kwargs)
+        status = "cancelled" if state["cancel"] else "succeeded"
+    except Exception as e:
+        status = "failed"
+        state["last_error"] = f"{e.__class__.__name__}: {e}\n{traceback.format_exc(limit=5)}"
+
+    flush(force=True)
+    c.execute("UPDATE jobs SET status = ?, finished_at = ?, summary = ? WHERE id = ?",
+              (status, _now(), json.dumps(metrics.summary(), ensure_ascii=False), job_id))
+    conn.commit()
+    conn.close()
+    return status
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    if pid in _processes:
+        return _processes[pid].poll() is None
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def get_job(job_id):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    job = c.fetchone()
+    # Processo morto sem finalizar o job (ex: servidor reiniciado): marca como falha
+    if job and job["status"] in ACTIVE_STATUSES:
+        _reap_stale(c)
+        conn.commit()
+        c.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        job = c.fetchone()
+    conn.close()
+    return job
+
+
+def get_active_job():
+    _reap_children()
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY id DESC LIMIT 1")
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        return None
+    job = get_job(row["id"])
+    return job if job["status"] in ACTIVE_STATUSES else None
+
+
+def list_jobs(limit=20):
+    _reap_children()
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def request_cancel(job_id):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+    conn.commit()
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker de um job de processamento (iniciado por start_processing_job)")
+    parser.add_argument("--job-id", type=int, required=True)
+    parser.add_argument("--db-path", required=True)
+    args = parser.parse_args(argv)
+    payload = json.load(sys.stdin)
+    run_job(args.job_id, payload["smtp_cfg"], payload["dry_run"], payload["options"], args.db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Limites (segundos) dos histogramas de latência por canal
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+OUTCOMES = ("sent", "failed", "skipped")
+
+
+class RunMetrics:
+    """Métricas de uma execução de process_reminders.
+
+    Acumula tempo por etapa, histogramas de latência por canal e contadores de
+    mensagens enviadas, com falha e ignoradas. Pode ser somada a outra instância
+    (merge) para manter totais acumulados em um processo de longa duração.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at = None
+        self.runs = 0
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.messages = defaultdict(int)  # (channel, outcome) -> total
+        self.latency_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.latency_sum = defaultdict(float)
+        self.latency_count = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name, seconds):
+        # Para tempos medidos fora da thread principal (ex: envios paralelos por WhatsApp)
+        self.stage_seconds[name] += seconds
+        self.stage_calls[name] += 1
+
+    def observe_latency(self, channel, seconds):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[channel][i] += 1
+        self.latency_sum[channel] += seconds
+        self.latency_count[channel] += 1
+
+    def count(self, channel, outcome, n=1):
+        self.messages[(channel, outcome)] += n
+
+    def finish(self):
+        self.finished_at = time.time()
+        self.runs += 1
+        return self
+
+    @property
+    def duration(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def totals(self):
+        totals = dict.fromkeys(OUTCOMES, 0)
+        for (_, outcome), n in self.messages.items():
+            totals[outcome] += n
+        return totals
+
+    def summary(self):
+        return {
+            "duration_seconds": round(self.duration, 4),
+            **self.totals(),
+            "by_channel": {f"{ch}:{outcome}": n for (ch, outcome), n in sorted(self.messages.items())},
+            "stages": {
+                name: {"seconds": round(self.stage_seconds[name], 4), "calls": self.stage_calls[name]}
+                for name in sorted(self.stage_seconds)
+            },
+            "latency": {
+                ch: {
+                    "count": self.latency_count[ch],
+                    "avg_seconds": round(self.latency_sum[ch] / self.latency_count[ch], 4) if self.latency_count[ch] else None,
+                }
+                for ch in sorted(self.latency_count)
+            },
+        }
+
+    def merge(self, other):
+        self.runs += other.runs
+        for name, seconds in other.stage_seconds.items():
+            self.stage_seconds[name] += seconds
+            self.stage_calls[name] += other.stage_calls[name]
+        for key, n in other.messages.items():
+            self.messages[key] += n
+        for ch, buckets in other.latency_buckets.items():
+            mine = self.latency_buckets[ch]
+            for i, n in enumerate(buckets):
+                mine[i] += n
+            self.latency_sum[ch] += other.latency_sum[ch]
+            self.latency_count[ch] += other.latency_count[ch]
+        return self
+
+    def to_prometheus(self, last_run=None):
+        # Formato texto de exposição do Prometheus (contadores acumulados + gauges da última execução)
+        lines = [
+            "# HELP gtr_runs_total Execuções de process_reminders concluídas.",
+            "# TYPE gtr_runs_total counter",
+            f"gtr_runs_total {self.runs}",
+            "# HELP gtr_messages_total Mensagens por canal e resultado.",
+            "# TYPE gtr_messages_total counter",
+        ]
+        for (ch, outcome), n in sorted(self.messages.items()):
+            lines.append(f'gtr_messages_total{{channel="{ch}",outcome="{outcome}"}} {n}')
+
+        lines += [
+            "# HELP gtr_stage_seconds_total Tempo gasto em cada etapa do processamento.",
+            "# TYPE gtr_stage_seconds_total counter",
+        ]
+        for name in sorted(self.stage_seconds):
+            lines.append(f'gtr_stage_seconds_total{{stage="{name}"}} {self.stage_seconds[name]:.6f}')
+
+        lines += [
+            "# HELP gtr_send_latency_seconds Latência de envio por canal.",
+            "# TYPE gtr_send_latency_seconds histogram",
+        ]
+        for ch in sorted(self.latency_count):
+            for bound, n in zip(LATENCY_BUCKETS, self.latency_buckets[ch]):
+                lines.append(f'gtr_send_latency_seconds_bucket{{channel="{ch}",le="{bound}"}} {n}')
+            lines.append(f'gtr_send_latency_seconds_bucket{{channel="{ch}",le="+Inf"}} {self.latency_count[ch]}')
+            lines.append(f'gtr_send_latency_seconds_sum{{channel="{ch}"}} {self.latency_sum[ch]:.6f}')
+            lines.append(f'gtr_send_latency_seconds_count{{channel="{ch}"}} {self.latency_count[ch]}')
+
+        if last_run is not None:
+            lines += [
+                "# HELP gtr_last_run_duration_seconds Duração da última execução.",
+                "# TYPE gtr_last_run_duration_seconds gauge",
+                f"gtr_last_run_duration_seconds {last_run.duration:.6f}",
+                "# HELP gtr_last_run_timestamp_seconds Fim da última execução (epoch).",
+                "# TYPE gtr_last_run_timestamp_seconds gauge",
+                f"gtr_last_run_timestamp_seconds {last_run.finished_at or time.time():.0f}",
+                "# HELP gtr_last_run_stage_seconds Tempo por etapa na última execução.",
+                "# TYPE gtr_last_run_stage_seconds gauge",
+            ]
+            for name in sorted(last_run.stage_seconds):
+                lines.append(f'gtr_last_run_stage_seconds{{stage="{name}"}} {last_run.stage_seconds[name]:.6f}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, last_run=None):
+        # Escrita atômica para o coletor (ex: node_exporter textfile) nunca ler um arquivo pela metade
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(last_run))
+        os.replace(tmp_path, path)
@@ -0,0 +1,104 @@
+import cProfile
+import os
+import pstats
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from database.connection import set_statement_tracer
+
+# Diretório de saída do modo de perfil; vazio = desativado
+PROFILE_DIR_ENV = "GTR_PROFILE_DIR"
+
+
+def profile_dir_from_env():
+    return os.environ.get(PROFILE_DIR_ENV) or None
+
+
+class StatementTracer:
+    """Estatísticas por instrução SQL executada via get_conn (duração e número de linhas).
+
+    Agrega à medida que as instruções chegam: a memória depende do número de instruções
+    distintas, não de quantas vezes foram executadas.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.statements = 0
+        self.transactions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, sql, seconds, rows):
+        # Agrupa por instrução (os parâmetros já vêm separados, então o texto é o "molde").
+        # Retorna a entrada agregada; a leitura das linhas (fetch) soma tempo e linhas nela.
+        sql = " ".join(sql.split())
+        with self._lock:
+            self.statements += 1
+            entry = self.stats.get(sql)
+            if entry is None:
+                entry = self.stats[sql] = {"sql": sql, "calls": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0}
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["rows"] += rows
+        return entry
+
+    def on_sqlite_trace(self, statement):
+        # Callback do SQLite: vê também o BEGIN/COMMIT implícitos do módulo sqlite3,
+        # úteis para achar commits por linha
+        keyword = statement.split(None, 1)[0].upper() if statement.strip() else ""
+        if keyword in ("BEGIN", "COMMIT", "ROLLBACK"):
+            with self._lock:
+                self.transactions[keyword] += 1
+
+    def aggregate(self):
+        with self._lock:
+            return sorted((dict(s) for s in self.stats.values()), key=lambda s: s["seconds"], reverse=True)
+
+    def report(self, top=30):
+        stats = self.aggregate()
+        total = sum(s["seconds"] for s in stats)
+        lines = [
+            f"{self.statements} instruções, {len(stats)} distintas, {total * 1000:.1f} ms no total",
+            "",
+            f"{'total ms':>10} {'chamadas':>9} {'máx ms':>9} {'linhas':>9}  sql",
+        ]
+        for s in stats[:top]:
+            flag = "  <- N+1?" if s["calls"] > 1 and s["calls"] >= self.statements // 4 else ""
+            lines.append(f"{s['seconds'] * 1000:>10.2f} {s['calls']:>9} {s['max_seconds'] * 1000:>9.2f} {s['rows']:>9}  {s['sql'][:160]}{flag}")
+        if self.transactions:
+            lines += ["", "Transações: " + ", ".join(f"{k} {n}" for k, n in sorted(self.transactions.items()))]
+        return "\n".join(lines) + "\n"
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", name).strip("_") or "run"
+
+
+@contextmanager
+def profiled(name, out_dir):
+    """Executa o bloco sob cProfile e rastreamento de SQL.
+
+    Grava em out_dir:
+      <nome>-<timestamp>.pstats   (abrir com `python -m pstats` ou snakeviz)
+      <nome>-<timestamp>-sql.txt  (relatório de instruções mais lentas)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{_slug(name)}-{datetime.now():%Y%m%d-%H%M%S}")
+    tracer = StatementTracer()
+    previous = set_statement_tracer(tracer)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield tracer
+    finally:
+        profiler.disable()
+        set_statement_tracer(previous)
+        profiler.dump_stats(f"{base}.pstats")
+        with open(f"{base}-sql.txt", "w", encoding="utf-8") as f:
+            f.write(tracer.report())
+            f.write("\n")
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats("cumulative").print_stats(25)
@@ -0,0 +1,98 @@
+import calendar
+import json
+from datetime import date, timedelta
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+
+def build_rule(freq, interval=1, weekdays=None, day=None, until=None, count=None):
+    """Monta a regra de recorrência gravada em reminders.recurrence (JSON).
+
+    freq: "daily", "weekly" (weekdays: 0=segunda ... 6=domingo) ou "monthly" (day: 1-31).
+    Termina em `until` (data, inclusive) e/ou após `count` ocorrências; sem ambos, não termina.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Frequência inválida: {freq}")
+    rule = {"freq": freq, "interval": max(int(interval or 1), 1)}
+    if freq == "weekly":
+        if not weekdays:
+            raise ValueError("Recorrência semanal exige ao menos um dia da semana.")
+        rule["weekdays"] = sorted({int(d) for d in weekdays})
+    if freq == "monthly":
+        if not day or not 1 <= int(day) <= 31:
+            raise ValueError("Recorrência mensal exige um dia entre 1 e 31.")
+        rule["day"] = int(day)
+    if until:
+        rule["until"] = until.isoformat() if isinstance(until, date) else str(until)
+    if count:
+        rule["count"] = int(count)
+    return rule
+
+
+def dumps(rule):
+    return json.dumps(rule) if rule else None
+
+
+def loads(value):
+    return json.loads(value) if value else None
+
+
+def _step(rule, dt):
+    interval = rule.get("interval", 1)
+    if rule["freq"] == "daily":
+        return dt + timedelta(days=interval)
+
+    if rule["freq"] == "weekly":
+        weekdays = rule["weekdays"]
+        later = [d for d in weekdays if d > dt.weekday()]
+        if later:
+            return dt + timedelta(days=later[0] - dt.weekday())
+        # volta ao primeiro dia da lista, `interval` semanas depois
+        start_of_week = dt - timedelta(days=dt.weekday())
+        return start_of_week + timedelta(weeks=interval, days=weekdays[0])
+
+    # monthly: dia N do mês seguinte (limitado ao último dia do mês)
+    month_index = dt.month - 1 + interval
+    year, month = dt.year + month_index // 12, month_index % 12 + 1
+    day = min(rule["day"], calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+
+def next_occurrence(rule, current, occurrence, now):
+    """Próxima ocorrência posterior a `now` a partir da ocorrência atual.
+
+    `occurrence` é o número (1, 2, ...) da ocorrência em `current`. Ocorrências que
+    ficaram no passado (ex: agendador parado) são puladas, sem gerar envios atrasados.
+    Retorna (datetime, número) ou (None, None) quando a série terminou.
+    """
+    until = date.fromisoformat(rule["until"]) if rule.get("until") else None
+    count = rule.get("count")
+    nxt = current
+    while True:
+        nxt = _step(rule, nxt)
+        occurrence += 1
+        if count and occurrence > count:
+            return None, None
+        if until and nxt.date() > until:
+            return None, None
+        if nxt > now:
+            return nxt, occurrence
+
+
+def describe(rule):
+    if not rule:
+        return "Não repete"
+    names = ["seg", "ter", "qua", "qui", "sex", "sáb", "dom"]
+    interval = rule.get("interval", 1)
+    if rule["freq"] == "daily":
+        text = "Diária" if interval == 1 else f"A cada {interval} dias"
+    elif rule["freq"] == "weekly":
+        days = ", ".join(names[d] for d in rule["weekdays"])
+        text = f"Semanal ({days})" if interval == 1 else f"A cada {interval} semanas ({days})"
+    else:
+        text = f"Mensal, dia {rule['day']}" if interval == 1 else f"A cada {interval} meses, dia {rule['day']}"
+    if rule.get("until"):
+        text += f", até {rule['until']}"
+    if rule.get("count"):
+        text += f", {rule['count']} vezes"
+    return text
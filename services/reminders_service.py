@@ -1,146 +1,442 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
+from time import perf_counter
 from database.connection import get_conn
-from services.smtp_service import send_email_smtp
-from services.whatsapp_web import WhatsAppWeb
-from services.utils import normalize_phone
+from services.metrics import RunMetrics
+from services.smtp_service import send_email_smtp, send_email_batch
+from services.whatsapp_web import WhatsAppPool, READY as WA_READY
+from services.utils import normalize_phone, due_cutoff
+from services import recurrence
+from database.models import PRIORITIES
+from services.suppressions import address_key, permanent_failure
 
-def process_reminders(smtp_cfg, dry_run=False):
-    conn = get_conn()
+def render_reminder_email(reminders, name=None):
+    # name=None gera um texto sem personalização (necessário para o envio em lote)
+    greeting = f"Olá {name}," if name else "Olá,"
+    if len(reminders) == 1:
+        r = reminders[0]
+        return f"Lembrete: {r['title']}", f"{greeting}\n\nLembrete: {r['title']}\n\n{r['description']}\n\nAtenciosamente"
+    items = "\n\n".join(f"{i}. {r['title']}\n{r['description']}" for i, r in enumerate(reminders, 1))
+    return f"Você tem {len(reminders)} lembretes", f"{greeting}\n\nVocê tem {len(reminders)} lembretes:\n\n{items}\n\nAtenciosamente"
+
+def render_reminder_whatsapp(reminders):
+    if len(reminders) == 1:
+        r = reminders[0]
+        return f"Lembrete: {r['title']}\n{r['description']}"
+    items = "\n\n".join(f"• {r['title']}\n{r['description']}" for r in reminders)
+    return f"Você tem {len(reminders)} lembretes:\n\n{items}"
+
+def process_reminders(smtp_cfg, dry_run=False, wa_sender=None, metrics=None, batch_email=False, digest=False,
+                      on_result=None, should_stop=None, chunk_size=500, bulk_share=0.2,
+                      conn=None, now=None, email_sender=None):
+    # metrics: RunMetrics opcional; ao final contém o resumo da execução (metrics.summary())
+    # batch_email: agrupa e-mails de lembrete com conteúdo idêntico em envelopes com vários
+    # destinatários (limite em smtp_cfg["batch_max_recipients"]); cada destinatário continua
+    # com sua própria linha em sent_log
+    # digest: junta os lembretes vencidos do mesmo usuário e canal (dentro de cada bloco de
+    # chunk_size lembretes) em uma única mensagem; o resultado continua registrado por lembrete
+    # on_result: chamado com cada registro de log assim que é gravado; é a única forma de
+    # acompanhar os envios individualmente, pois nada é acumulado em memória
+    # chunk_size: lembretes/usuários lidos do banco por vez (memória constante)
+    # bulk_share: fração de cada bloco reservada à faixa "bulk" enquanto houver lembretes
+    # "urgent"/"normal" vencidos; o restante do bulk vai depois dos aniversários
+    # should_stop: função consultada entre envios; se retornar True o processamento é
+    # interrompido sem deixar lembretes enviados pela metade (os restantes ficam pendentes)
+    # conn: conexão já aberta a usar no lugar de get_conn() (ex: snapshot em memória da
+    # simulação); não é fechada aqui
+    # now: momento de referência para os lembretes vencidos e aniversários (padrão: agora)
+    # email_sender: objeto com send(to, subject, body) e send_batch(recipients, subject, body,
+    # max_recipients) usado no lugar do SMTP (ex: services/simulation.py)
+    # Retorna apenas o resumo da execução (metrics.summary() + "stopped").
+    metrics = metrics if metrics is not None else RunMetrics()
+    owns_conn = conn is None
+    conn = get_conn() if owns_conn else conn
     c = conn.cursor()
-    logs = []
-    now = datetime.now()
-    
-    # Inicializa o WhatsAppWeb (se não for dry_run)
-    wa_sender = None
-    if not dry_run:
-        try:
-            wa_sender = WhatsAppWeb()
-            wa_sender.start() # Isso exigirá a leitura do QR Code pelo usuário
-        except Exception as e:
-            logs.append({"details": f"Falha ao iniciar WhatsAppWeb: {e}"})
+    now = now or datetime.now()
+
+    def emit(entry):
+        if on_result:
+            on_result(entry)
+
+    def stop_requested():
+        return bool(should_stop and should_stop())
+
+    # Um sender fornecido pelo chamador (ex: agendador, benchmarks) não é iniciado nem fechado aqui
+    owns_wa_sender = wa_sender is None
+
+    # Inicializa o WhatsAppWeb (se não for dry_run) com o perfil persistente; sem sessão
+    # autenticada não bloqueia: os envios por WhatsApp falham com a instrução de login
+    # (GTR_WA_SESSIONS > 1 abre várias sessões, usadas em paralelo)
+    if owns_wa_sender and not dry_run:
+        with metrics.stage("whatsapp_start"):
+            wa_sender = WhatsAppPool()
+            state = wa_sender.ensure_started()
+        if state != WA_READY:
+            emit({"details": f"Falha ao iniciar WhatsAppWeb: {wa_sender.details}"})
             # Continua o processamento, mas sem WhatsApp
 
-    # lembretes agendados
-    c.execute("""
-        SELECT r.*, u.email, u.phone, u.name
-        FROM reminders r
-        JOIN users u ON r.user_id = u.id
-        WHERE r.sent = 0
-    """)
-    reminders = c.fetchall()
-
-    # 1) lembretes agendados
-    for r in reminders:
-        remind_at = datetime.fromisoformat(r["remind_at"])
-        if now >= remind_at:
+    # Senders com várias sessões (size > 1) recebem envios simultâneos; os resultados
+    # voltam para a thread principal, que grava o log e marca os lembretes
+    wa_workers = getattr(wa_sender, "size", 1) if wa_sender and not dry_run else 1
+    executor = ThreadPoolExecutor(max_workers=wa_workers) if wa_workers > 1 else None
+    inflight = {}  # future -> callback(success, details)
+
+    def send_email(to_email, subject, body):
+        if dry_run:
+            return True, "dry run"
+        start = perf_counter()
+        if email_sender:
+            result = email_sender.send(to_email, subject, body)
+        else:
+            result = send_email_smtp(to_email, subject, body, smtp_cfg, metrics=metrics)
+        metrics.observe_latency("email", perf_counter() - start)
+        return result
+
+    def send_whatsapp(phone, message):
+        if dry_run:
+            return True, "dry run"
+        if not wa_sender:
+            return False, "WhatsApp sender not initialized"
+        start = perf_counter()
+        with metrics.stage("whatsapp_send"):
+            result = wa_sender.send(phone, message)
+        metrics.observe_latency("whatsapp", perf_counter() - start)
+        return result
+
+    def timed_whatsapp_send(phone, message):
+        start = perf_counter()
+        result = wa_sender.send(phone, message)
+        return result, perf_counter() - start
+
+    def dispatch_whatsapp(phone, message, on_done):
+        # Envia já (sender de uma sessão) ou coloca na fila do executor; on_done é chamado
+        # com (success, details) na thread principal
+        if executor is None:
+            on_done(*send_whatsapp(phone, message))
+            return
+        inflight[executor.submit(timed_whatsapp_send, phone, message)] = on_done
+        if len(inflight) >= 2 * wa_workers:
+            drain_whatsapp(wait_all=False)
+
+    def drain_whatsapp(wait_all=True):
+        while inflight:
+            done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+            for future in done:
+                on_done = inflight.pop(future)
+                result, seconds = future.result()
+                metrics.add_stage("whatsapp_send", seconds)
+                metrics.observe_latency("whatsapp", seconds)
+                on_done(*result)
+            if not wait_all:
+                return
+
+    def record(user_id, reminder_id, log_channel, metric_channel, success, details, attempted=True, address=None):
+        outcome = "skipped" if not attempted else ("sent" if success else "failed")
+        metrics.count(metric_channel, outcome)
+
+        # Registrar no log
+        with metrics.stage("log_commit"):
+            c.execute("INSERT INTO sent_log (user_id, reminder_id, sent_at, channel, success, skipped, details) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      (user_id, reminder_id, datetime.now().isoformat(), log_channel, int(success), int(not attempted), details))
+            # Falha permanente (e-mail recusado, número sem WhatsApp): não tenta mais este contato
+            reason = permanent_failure(metric_channel, details) if attempted and not success and address else None
+            if reason:
+                c.execute("""
+                    INSERT OR IGNORE INTO suppressions (channel, address, reason, source, created_at)
+                    VALUES (?, ?, ?, 'send', ?)
+                """, (metric_channel, address_key(metric_channel, address), reason, datetime.now().isoformat(timespec='seconds')))
+            conn.commit()
+
+        emit({
+            "user_id": user_id,
+            "reminder_id": reminder_id,
+            "sent_at": datetime.now().isoformat(),
+            "channel": metric_channel if reminder_id else f"{metric_channel} (birthday)",
+            "success": int(success),
+            "details": details,
+            "outcome": outcome
+        })
+
+    def load_suppressions(rows):
+        # Contatos suprimidos entre os do bloco: {(canal, endereço): motivo}, em uma consulta
+        # por bloco (fatiada só para respeitar o limite de parâmetros do SQLite)
+        pairs = {("email", address_key("email", r["email"])) for r in rows}
+        pairs |= {("whatsapp", address_key("whatsapp", r["phone"])) for r in rows}
+        pairs = [p for p in pairs if p[1]]
+        found = {}
+        with metrics.stage("select"):
+            for i in range(0, len(pairs), 400):
+                part = pairs[i:i + 400]
+                c.execute(f"""
+                    SELECT channel, address, reason FROM suppressions
+                    WHERE (channel, address) IN (VALUES {','.join(['(?, ?)'] * len(part))})
+                """, [v for pair in part for v in pair])
+                found.update({(row["channel"], row["address"]): row["reason"] for row in c.fetchall()})
+        return found
+
+    def complete(rows):
+        # Marca como enviado ou, em lembretes recorrentes, avança para a próxima ocorrência
+        # (a série ocupa sempre uma única linha em reminders)
+        with metrics.stage("log_commit"):
+            for r in rows:
+                rule = recurrence.loads(r["recurrence"])
+                next_at = None
+                if rule:
+                    next_at, occurrence = recurrence.next_occurrence(
+                        rule, datetime.fromisoformat(r["remind_at"]), r["occurrence"] or 1, now)
+                if next_at:
+                    c.execute("UPDATE reminders SET remind_at = ?, occurrence = ? WHERE id = ?",
+                              (next_at.isoformat(sep=' ', timespec='minutes'), occurrence, r["id"]))
+                else:
+                    c.execute("UPDATE reminders SET sent = 1 WHERE id = ?", (r["id"],))
+            conn.commit()
+
+    # e-mails adiados para envio em lote: (assunto, corpo) -> [(lembrete, email)]
+    email_batches = {}
+
+    def flush_email_batches():
+        max_recipients = int(smtp_cfg.get("batch_max_recipients", 50))
+        for (subject, body), items in email_batches.items():
+            if dry_run:
+                results = {email: (True, "dry run") for _, email in items}
+            else:
+                start = perf_counter()
+                recipients = [email for _, email in items]
+                if email_sender:
+                    results = email_sender.send_batch(recipients, subject, body, max_recipients)
+                else:
+                    results = send_email_batch(recipients, subject, body, smtp_cfg,
+                                               max_recipients=max_recipients, metrics=metrics)
+                metrics.observe_latency("email", perf_counter() - start)
+            for r, email in items:
+                success, details = results[email]
+                record(r["user_id"], r["id"], "email", "email", success, details, address=email)
+        pending = {r["id"]: r for items in email_batches.values() for r, _ in items}
+        complete(pending.values())
+        email_batches.clear()
+
+    def lane_rows(priority, cursor, limit):
+        # Paginação por chave (remind_at, id) dentro da faixa, sobre o índice idx_reminders_lane:
+        # as linhas já processadas saem do filtro (sent = 1 ou remind_at avançado para o futuro).
+        # A conferência exata do vencimento é em Python (is_due).
+        if limit <= 0:
+            return []
+        with metrics.stage("select"):
+            c.execute("""
+                SELECT r.*, u.email, u.phone, u.name
+                FROM reminders r
+                JOIN users u ON r.user_id = u.id
+                WHERE r.sent = 0 AND r.priority = ? AND r.remind_at <= ? AND (r.remind_at, r.id) > (?, ?)
+                ORDER BY r.remind_at, r.id
+                LIMIT ?
+            """, (priority, due_cutoff(now), cursor[0], cursor[1], limit))
+            rows = c.fetchall()
+        if rows:
+            cursor[:] = [rows[-1]["remind_at"], rows[-1]["id"]]
+        return rows
+
+    def is_due(rows):
+        return [r for r in rows if now >= datetime.fromisoformat(r["remind_at"])]
+
+    cursors = {p: ["", 0] for p in PRIORITIES}
+
+    def priority_chunks():
+        # Cada bloco: urgent primeiro, depois normal, e até bulk_share do bloco para bulk
+        # (mais a capacidade que as faixas altas não usaram). Termina quando urgent e
+        # normal se esgotam; o bulk restante fica para bulk_chunks.
+        bulk_quota = min(max(1, round(chunk_size * bulk_share)), chunk_size - 1) if bulk_share > 0 else 0
+        pending = {"urgent", "normal"}
+        while pending:
+            rows = []
+            for priority in ("urgent", "normal"):
+                limit = chunk_size - bulk_quota - len(rows)
+                if priority in pending and limit > 0:
+                    got = lane_rows(priority, cursors[priority], limit)
+                    if len(got) < limit:
+                        pending.discard(priority)
+                    rows.extend(got)
+            rows.extend(lane_rows("bulk", cursors["bulk"], chunk_size - len(rows) if pending else bulk_quota))
+            yield is_due(rows)
+
+    def bulk_chunks():
+        while True:
+            rows = lane_rows("bulk", cursors["bulk"], chunk_size)
+            if not rows:
+                return
+            yield is_due(rows)
+
+    def process_due(due):
+        # Cada envio cobre um grupo de lembretes: um por lembrete/canal ou, no modo digest,
+        # todos os lembretes do mesmo usuário/canal em uma única mensagem.
+        # Retorna True se o processamento foi interrompido por should_stop.
+        groups = {}
+        undispatched = {}  # canais ainda não enviados (nem colocados na fila) por lembrete
+        unresolved = {}  # canais ainda sem resultado por lembrete
+        for r in due:
             channels = [r["channel"]] if r["channel"] != "both" else ["email", "whatsapp"]
+            undispatched[r["id"]] = unresolved[r["id"]] = len(channels)
             for ch in channels:
-                success = False
-                details = "not attempted"
-                
-                if ch == "email" and r["email"]:
-                    subject = f"Lembrete: {r['title']}"
-                    body = f"Olá {r['name']},\n\nLembrete: {r['title']}\n\n{r['description']}\n\nAtenciosamente"
-                    if dry_run:
-                        success, details = True, "dry run"
-                    else:
-                        success, details = send_email_smtp(r['email'], subject, body, smtp_cfg)
-                        
-                if ch == "whatsapp" and r["phone"]:
-                    phone = normalize_phone(r["phone"])
-                    message = f"Lembrete: {r['title']}\n{r['description']}"
-                    if dry_run:
-                        success, details = True, "dry run"
-                    elif wa_sender:
-                        success, details = wa_sender.send(phone, message)
-                    else:
-                        details = "WhatsApp sender not initialized"
-                        
-                logs.append({
-                    "user_id": r["user_id"],
-                    "reminder_id": r["id"],
-                    "sent_at": datetime.now().isoformat(),
-                    "channel": ch,
-                    "success": int(success),
-                    "details": details
-                })
-                
-                # Registrar no log
-                c.execute("INSERT INTO sent_log (user_id, reminder_id, sent_at, channel, success, details) VALUES (?, ?, ?, ?, ?, ?)", 
-                          (r["user_id"], r["id"], datetime.now().isoformat(), ch, int(success), details))
-                conn.commit()
-                
+                key = (r["user_id"], ch) if digest else (r["id"], ch)
+                groups.setdefault(key, []).append(r)
+
+        deferred = set()
+        partial = set()  # lembretes com algum canal já enviado e outro ainda não
+
+        def resolve(group):
             # marcar como enviado - evita reenvio infinito
-            c.execute("UPDATE reminders SET sent = 1 WHERE id = ?", (r["id"],))
-            conn.commit()
+            # (lembretes com e-mail em lote são marcados no envio do lote)
+            for r in group:
+                unresolved[r["id"]] -= 1
+                if unresolved[r["id"]] == 0 and r["id"] not in deferred:
+                    complete([r])
+
+        def recorder(ch, group, attempted=True, address=None):
+            def on_done(success, details):
+                for r in group:
+                    record(r["user_id"], r["id"], ch, ch, success, details, attempted, address)
+                resolve(group)
+            return on_done
+
+        blocked = load_suppressions(due)
+
+        stopped = False
+        for (_, ch), group in groups.items():
+            if not partial and stop_requested():
+                stopped = True
+                break
+            first = group[0]
+            address = address_key(ch, first["email"] if ch == "email" else first["phone"])
+
+            if (ch, address) in blocked:
+                recorder(ch, group, attempted=False)(False, f"Suprimido: {blocked[(ch, address)]}")
+
+            elif ch == "email" and first["email"] and batch_email:
+                # conteúdo sem o nome do destinatário, para ser idêntico entre usuários
+                with metrics.stage("render"):
+                    subject, body = render_reminder_email(group)
+                email_batches.setdefault((subject, body), []).extend((r, first["email"]) for r in group)
+                deferred.update(r["id"] for r in group)
+                resolve(group)
+
+            elif ch == "email" and first["email"]:
+                with metrics.stage("render"):
+                    subject, body = render_reminder_email(group, first["name"])
+                recorder(ch, group, address=first["email"])(*send_email(first['email'], subject, body))
+
+            elif ch == "whatsapp" and first["phone"]:
+                with metrics.stage("render"):
+                    phone = normalize_phone(first["phone"])
+                    message = render_reminder_whatsapp(group)
+                dispatch_whatsapp(phone, message, recorder(ch, group, address=first["phone"]))
+
+            else:
+                recorder(ch, group, attempted=False)(False, "not attempted")
+
+            for r in group:
+                undispatched[r["id"]] -= 1
+                if undispatched[r["id"]] == 0:
+                    partial.discard(r["id"])
+                else:
+                    partial.add(r["id"])
 
-    # 2) aniversários do dia
-    today_md = (now.month, now.day)
-    c.execute("SELECT * FROM users WHERE birthdate IS NOT NULL")
-    users = c.fetchall()
-    
-    for u in users:
-        try:
-            bd = datetime.fromisoformat(u["birthdate"]).date()
-        except Exception:
-            continue
-            
-        if (bd.month, bd.day) == today_md:
-            # check if already sent today
-            c.execute("SELECT COUNT(*) FROM sent_log WHERE user_id = ? AND DATE(sent_at) = DATE(?) AND channel = 'birthday'", (u["id"], now.isoformat()))
-            already = c.fetchone()[0]
-            if already:
+        # Envios já colocados na fila são concluídos mesmo após should_stop
+        drain_whatsapp()
+        flush_email_batches()
+        return stopped
+
+    def birthday_chunks():
+        # Apenas aniversariantes do dia (MM-DD da data ISO), paginados por id
+        last_id = 0
+        while True:
+            with metrics.stage("select"):
+                c.execute("""
+                    SELECT * FROM users
+                    WHERE birthdate IS NOT NULL AND substr(birthdate, 6, 5) = ? AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                """, (now.strftime("%m-%d"), last_id, chunk_size))
+                rows = c.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield rows
+
+    def process_birthdays(users):
+        # check if already sent today (uma consulta por bloco)
+        with metrics.stage("select"):
+            ids = [u["id"] for u in users]
+            c.execute(f"""
+                SELECT DISTINCT user_id FROM sent_log
+                WHERE channel = 'birthday' AND DATE(sent_at) = DATE(?) AND user_id IN ({','.join('?' * len(ids))})
+            """, (now.isoformat(), *ids))
+            already = {row["user_id"] for row in c.fetchall()}
+        blocked = load_suppressions(users)
+
+        for u in users:
+            if stop_requested():
+                return True
+            try:
+                bd = datetime.fromisoformat(u["birthdate"]).date()
+            except Exception:
+                continue
+            if (bd.month, bd.day) != (now.month, now.day) or u["id"] in already:
                 continue
-                
+
             # attempt send via email + whatsapp if available
-            
+
             # email
-            if u["email"]:
-                subject = "Feliz aniversário!"
-                body = f"Olá {u['name']},\n\nDesejamos a você um feliz aniversário!\n\nAtenciosamente"
-                if dry_run:
-                    success, details = True, "dry run"
-                else:
-                    success, details = send_email_smtp(u['email'], subject, body, smtp_cfg)
-                    
-                logs.append({
-                    "user_id": u["id"],
-                    "reminder_id": None,
-                    "sent_at": datetime.now().isoformat(),
-                    "channel": "email (birthday)",
-                    "success": int(success),
-                    "details": details
-                })
-                c.execute("INSERT INTO sent_log (user_id, reminder_id, sent_at, channel, success, details) VALUES (?, ?, ?, ?, ?, ?)", 
-                          (u["id"], None, datetime.now().isoformat(), 'birthday', int(success), details))
-                conn.commit()
-                
+            email_key = ("email", address_key("email", u["email"]))
+            if u["email"] and email_key in blocked:
+                record(u["id"], None, 'birthday', "email", False, f"Suprimido: {blocked[email_key]}", attempted=False)
+            elif u["email"]:
+                with metrics.stage("render"):
+                    subject = "Feliz aniversário!"
+                    body = f"Olá {u['name']},\n\nDesejamos a você um feliz aniversário!\n\nAtenciosamente"
+                success, details = send_email(u['email'], subject, body)
+                record(u["id"], None, 'birthday', "email", success, details, address=u["email"])
+
             # whatsapp
-            if u["phone"]:
-                phone = normalize_phone(u["phone"])
-                message = f"Feliz aniversário, {u['name']}! 🎉\nTudo de bom hoje e sempre."
-                if dry_run:
-                    success, details = True, "dry run"
-                elif wa_sender:
-                    success, details = wa_sender.send(phone, message)
-                else:
-                    details = "WhatsApp sender not initialized"
-                    
-                logs.append({
-                    "user_id": u["id"],
-                    "reminder_id": None,
-                    "sent_at": datetime.now().isoformat(),
-                    "channel": "whatsapp (birthday)",
-                    "success": int(success),
-                    "details": details
-                })
-                c.execute("INSERT INTO sent_log (user_id, reminder_id, sent_at, channel, success, details) VALUES (?, ?, ?, ?, ?, ?)", 
-                          (u["id"], None, datetime.now().isoformat(), 'birthday', int(success), details))
-                conn.commit()
-
-    # Fecha o WhatsAppWeb
-    if wa_sender:
-        wa_sender.close()
-        
-    return logs
+            phone_key = ("whatsapp", address_key("whatsapp", u["phone"]))
+            if u["phone"] and phone_key in blocked:
+                record(u["id"], None, 'birthday', "whatsapp", False, f"Suprimido: {blocked[phone_key]}", attempted=False)
+            elif u["phone"]:
+                with metrics.stage("render"):
+                    phone = normalize_phone(u["phone"])
+                    message = f"Feliz aniversário, {u['name']}! 🎉\nTudo de bom hoje e sempre."
+                dispatch_whatsapp(phone, message, lambda success, details, user_id=u["id"], address=u["phone"]:
+                                  record(user_id, None, 'birthday', "whatsapp", success, details, address=address))
+        return False
+
+    def run_due(chunks):
+        for due in chunks:
+            if process_due(due):
+                return True
+        return False
+
+    stopped = False
+    try:
+        # 1) lembretes urgent/normal (com a fatia garantida do bulk)
+        stopped = run_due(priority_chunks())
+
+        # 2) aniversários do dia
+        if not stopped:
+            for users in birthday_chunks():
+                stopped = process_birthdays(users)
+                drain_whatsapp()
+                if stopped:
+                    break
+
+        # 3) restante dos envios em massa
+        if not stopped:
+            stopped = run_due(bulk_chunks())
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
+        # Fecha o WhatsAppWeb
+        if wa_sender and owns_wa_sender:
+            wa_sender.close()
+        if owns_conn:
+            conn.close()
+        metrics.finish()
 
+    return {**metrics.summary(), "stopped": stopped}
@@ -0,0 +1,180 @@
+"""Simulação de uma execução de process_reminders sem efeitos colaterais.
+
+O banco é copiado para um SQLite em memória (API de backup) e o pipeline completo roda
+sobre essa cópia com senders falsos, que não esperam de verdade: cada envio soma a
+latência configurada a um relógio virtual. O banco real e os destinatários não são tocados.
+
+Uso pela linha de comando:
+    python -m services.simulation --at "2026-11-03 08:00" --email-latency 0.8 --whatsapp-latency 6 \\
+        --whatsapp-sessions 2 --email-per-minute 30
+"""
+import argparse
+import json
+import math
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+from database.connection import get_conn
+from services.metrics import RunMetrics
+from services.reminders_service import process_reminders
+
+
+class SimulatedEmailSender:
+    """Substitui o SMTP: conta mensagens (envelopes) e destinatários e soma a latência."""
+
+    def __init__(self, latency=0.5, failure_rate=0.0, seed=42):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.messages = 0
+        self.recipients = 0
+        self.seconds = 0.0
+        self._rng = random.Random(seed)
+
+    def _result(self):
+        if self._rng.random() < self.failure_rate:
+            return False, "simulated failure"
+        return True, "simulated"
+
+    def send(self, to, subject, body):
+        self.messages += 1
+        self.recipients += 1
+        self.seconds += self.latency
+        return self._result()
+
+    def send_batch(self, recipients, subject, body, max_recipients=50):
+        # Mesma deduplicação de send_email_batch (usuários que compartilham o e-mail)
+        recipients = list(dict.fromkeys(recipients))
+        envelopes = math.ceil(len(recipients) / max(int(max_recipients), 1))
+        self.messages += envelopes
+        self.recipients += len(recipients)
+        self.seconds += envelopes * self.latency
+        return {email: self._result() for email in recipients}
+
+
+class SimulatedWhatsAppSender:
+    """Substitui o WhatsAppPool: `sessions` sessões dividindo os envios."""
+
+    def __init__(self, latency=5.0, sessions=1, failure_rate=0.0, seed=42):
+        self.latency = latency
+        self.sessions = max(int(sessions), 1)
+        self.failure_rate = failure_rate
+        self.messages = 0
+        self.seconds = 0.0  # soma das latências de todas as sessões
+        self._rng = random.Random(seed)
+        # Sem paralelismo real: process_reminders envia em sequência e o tempo por sessão
+        # é calculado no relatório
+        self.size = 1
+
+    def send(self, number, message):
+        self.messages += 1
+        self.seconds += self.latency
+        if self._rng.random() < self.failure_rate:
+            return False, "simulated failure"
+        return True, "simulated"
+
+    def close(self):
+        pass
+
+
+def snapshot_db():
+    """Cópia em memória do banco atual (consistente mesmo com escritas em andamento)."""
+    source = get_conn()
+    snapshot = sqlite3.connect(":memory:")
+    source.backup(snapshot)
+    source.close()
+    snapshot.row_factory = sqlite3.Row
+    return snapshot
+
+
+def _channel_seconds(messages, send_seconds, per_minute, parallel=1):
+    # Tempo do canal = o maior entre a latência (dividida entre as sessões) e o mínimo
+    # imposto pelo limite de envios por minuto (por sessão/conta)
+    latency_seconds = send_seconds / parallel
+    limit_seconds = messages / (per_minute * parallel) * 60 if per_minute else 0.0
+    return {
+        "messages": messages,
+        "latency_seconds": round(latency_seconds, 2),
+        "rate_limit_per_minute": per_minute,
+        "rate_limit_delay_seconds": round(max(limit_seconds - latency_seconds, 0.0), 2),
+        "seconds": round(max(latency_seconds, limit_seconds), 2),
+    }
+
+
+def simulate(at=None, smtp_cfg=None, batch_email=False, digest=False, email_latency=0.5, whatsapp_latency=5.0,
+             whatsapp_sessions=1, email_per_minute=None, whatsapp_per_minute=None, failure_rate=0.0, seed=42):
+    """Executa process_reminders sobre um snapshot em memória no momento `at`.
+
+    Retorna um relatório com volumes por canal, tempo projetado da execução e o atraso
+    causado pelos limites de envio por minuto.
+    """
+    at = at or datetime.now()
+    smtp_cfg = dict(smtp_cfg or {})
+    smtp_cfg.setdefault("batch_max_recipients", 50)
+
+    start = time.perf_counter()
+    snapshot = snapshot_db()
+    snapshot_seconds = time.perf_counter() - start
+
+    email = SimulatedEmailSender(email_latency, failure_rate, seed)
+    whatsapp = SimulatedWhatsAppSender(whatsapp_latency, whatsapp_sessions, failure_rate, seed)
+    metrics = RunMetrics()
+    try:
+        summary = process_reminders(smtp_cfg, metrics=metrics, batch_email=batch_email, digest=digest,
+                                    conn=snapshot, now=at, email_sender=email, wa_sender=whatsapp)
+    finally:
+        snapshot.close()
+
+    # Tempo de processamento local (banco, renderização) medido, sem a latência dos envios
+    # (os senders falsos retornam na hora)
+    processing_seconds = summary["duration_seconds"]
+    channels = {
+        "email": {**_channel_seconds(email.messages, email.seconds, email_per_minute), "recipients": email.recipients},
+        "whatsapp": {**_channel_seconds(whatsapp.messages, whatsapp.seconds, whatsapp_per_minute, whatsapp.sessions),
+                     "sessions": whatsapp.sessions},
+    }
+    # Com várias sessões o WhatsApp envia em paralelo com o e-mail; com uma, em sequência
+    if whatsapp.sessions > 1:
+        sending_seconds = max(channels["email"]["seconds"], channels["whatsapp"]["seconds"])
+    else:
+        sending_seconds = channels["email"]["seconds"] + channels["whatsapp"]["seconds"]
+
+    return {
+        "at": at.isoformat(sep=' ', timespec='minutes'),
+        "snapshot_seconds": round(snapshot_seconds, 4),
+        "processing_seconds": round(processing_seconds, 4),
+        "projected_seconds": round(processing_seconds + sending_seconds, 2),
+        "sent": summary["sent"],
+        "failed": summary["failed"],
+        "skipped": summary["skipped"],
+        "by_channel": summary["by_channel"],
+        "channels": channels,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simula uma execução de envio sem alterar o banco")
+    parser.add_argument("--at", type=datetime.fromisoformat, help="momento simulado (padrão: agora)")
+    parser.add_argument("--batch-email", action="store_true")
+    parser.add_argument("--digest", action="store_true")
+    parser.add_argument("--batch-max", type=int, default=50, help="destinatários por envelope no envio em lote")
+    parser.add_argument("--email-latency", type=float, default=0.5, help="segundos por mensagem SMTP")
+    parser.add_argument("--whatsapp-latency", type=float, default=5.0, help="segundos por envio no WhatsApp Web")
+    parser.add_argument("--whatsapp-sessions", type=int, default=1)
+    parser.add_argument("--email-per-minute", type=float, help="limite de mensagens SMTP por minuto")
+    parser.add_argument("--whatsapp-per-minute", type=float, help="limite de envios por minuto em cada sessão")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    report = simulate(
+        at=args.at, smtp_cfg={"batch_max_recipients": args.batch_max}, batch_email=args.batch_email, digest=args.digest,
+        email_latency=args.email_latency, whatsapp_latency=args.whatsapp_latency,
+        whatsapp_sessions=args.whatsapp_sessions, email_per_minute=args.email_per_minute,
+        whatsapp_per_minute=args.whatsapp_per_minute, failure_rate=args.failure_rate,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
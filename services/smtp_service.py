@@ -1,7 +1,15 @@
 import smtplib
+from contextlib import nullcontext
 from email.message import EmailMessage
 
-def send_email_smtp(to_email: str, subject: str, body: str, smtp_cfg: dict):
+def _stage(metrics, name):
+    return metrics.stage(name) if metrics else nullcontext()
+
+def _refusal(code, reason):
+    # "550 5.1.1 User unknown": mesmo formato para envio simples e em lote
+    return f"{code} {reason.decode(errors='replace') if isinstance(reason, bytes) else reason}"
+
+def send_email_smtp(to_email: str, subject: str, body: str, smtp_cfg: dict, metrics=None):
     try:
         msg = EmailMessage()
         msg["Subject"] = subject
@@ -9,15 +17,70 @@ def send_email_smtp(to_email: str, subject: str, body: str, smtp_cfg: dict):
         msg["To"] = to_email
         msg.set_content(body)
 
-        server = smtplib.SMTP(smtp_cfg["host"], smtp_cfg["port"])
-        if smtp_cfg["use_tls"]:
-            server.starttls()
-        if smtp_cfg["username"]:
-            server.login(smtp_cfg["username"], smtp_cfg["password"])
+        with _stage(metrics, "smtp_connect"):
+            server = smtplib.SMTP(smtp_cfg["host"], smtp_cfg["port"])
+            if smtp_cfg["use_tls"]:
+                server.starttls()
+            if smtp_cfg["username"]:
+                server.login(smtp_cfg["username"], smtp_cfg["password"])
 
-        server.send_message(msg)
-        server.quit()
+        with _stage(metrics, "smtp_send"):
+            try:
+                server.send_message(msg)
+            finally:
+                server.quit()
         return True, "Sent"
 
+    except smtplib.SMTPRecipientsRefused as e:
+        code, reason = next(iter(e.recipients.values()))
+        return False, _refusal(code, reason)
     except Exception as e:
         return False, str(e)
+
+def send_email_batch(recipients, subject: str, body: str, smtp_cfg: dict, max_recipients=50, metrics=None):
+    # Envia o mesmo conteúdo para vários destinatários em envelopes com múltiplos RCPT TO
+    # (os endereços não aparecem no cabeçalho, como em um BCC). Uma única conexão é usada
+    # para todos os envelopes. Retorna {email: (success, details)} por destinatário.
+    recipients = list(dict.fromkeys(recipients))
+    results = {}
+    try:
+        with _stage(metrics, "smtp_connect"):
+            server = smtplib.SMTP(smtp_cfg["host"], smtp_cfg["port"])
+            if smtp_cfg["use_tls"]:
+                server.starttls()
+            if smtp_cfg["username"]:
+                server.login(smtp_cfg["username"], smtp_cfg["password"])
+    except Exception as e:
+        return {to_email: (False, str(e)) for to_email in recipients}
+
+    for i in range(0, len(recipients), max_recipients):
+        chunk = recipients[i:i + max_recipients]
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = smtp_cfg.get("from_email")
+        msg["To"] = smtp_cfg.get("from_email") or "undisclosed-recipients:;"
+        msg.set_content(body)
+        try:
+            with _stage(metrics, "smtp_send"):
+                refused = server.send_message(msg, to_addrs=chunk)
+        except smtplib.SMTPRecipientsRefused as e:
+            refused = e.recipients
+        except Exception as e:
+            for to_email in chunk:
+                results[to_email] = (False, str(e))
+            try:
+                server.rset()
+            except Exception:
+                pass
+            continue
+        for to_email in chunk:
+            if to_email in refused:
+                results[to_email] = (False, _refusal(*refused[to_email]))
+            else:
+                results[to_email] = (True, f"Sent (batch of {len(chunk)})")
+
+    try:
+        server.quit()
+    except Exception:
+        pass
+    return results
@@ -0,0 +1,91 @@
+"""Regras da lista de supressão: endereços e números que não devem mais ser tentados.
+
+Uma entrada é (canal, endereço) com canal "email" (e-mail normalizado) ou "whatsapp"
+(telefone normalizado). Entram na lista contatos inválidos detectados na importação e
+destinatários com falha permanente no envio; a gravação fica em database.models.
+"""
+import re
+
+from services.utils import normalize_email, normalize_phone
+
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# Telefone normalizado (só dígitos): DDD + número, com ou sem o código do país
+PHONE_MIN_DIGITS = 10
+PHONE_MAX_DIGITS = 15
+
+# Resposta SMTP de recusa: "550 5.1.1 User unknown" (código e, opcionalmente, o código estendido
+# da RFC 3463). Só as recusas por destinatário chegam neste formato; falhas de conexão/autenticação não.
+SMTP_REPLY_RE = re.compile(r"^(5\d\d)(?:[ -]+(5\.\d{1,3}\.\d{1,3})\b)?")
+SMTP_ENHANCED_RE = re.compile(r"\b5\.\d{1,3}\.\d{1,3}\b")
+# Formato antigo do envio simples (str de SMTPRecipientsRefused), ainda presente em sent_log:
+# "{'a@b.com': (550, b'5.1.1 User unknown')}"
+SMTP_LEGACY_REFUSED_RE = re.compile(r"^\{.*?: \((5\d\d), b?['\"](.*?)['\"]?\)\}?$")
+# Sem código estendido, só estes indicam endereço/caixa inexistente (551/552/554 são
+# encaminhamento, cota e política)
+SMTP_ADDRESS_CODES = ("550", "553")
+# 5.1.x é o status do endereço de destino, exceto 5.1.7/5.1.8, que se referem ao remetente
+SMTP_SENDER_STATUSES = ("5.1.7", "5.1.8")
+
+# Prefixo gravado pelo WhatsAppWeb quando o número não tem WhatsApp
+WHATSAPP_INVALID_PREFIX = "Número inválido no WhatsApp"
+
+
+def is_valid_email(email):
+    return bool(email) and bool(EMAIL_RE.match(email))
+
+
+def is_valid_phone(phone):
+    return bool(phone) and phone.isdigit() and PHONE_MIN_DIGITS <= len(phone) <= PHONE_MAX_DIGITS
+
+
+def address_key(channel, value):
+    # Forma usada na tabela suppressions e nas consultas do envio
+    if not value:
+        return None
+    return normalize_email(value) if channel == "email" else normalize_phone(str(value)) or None
+
+
+def contact_problems(data):
+    """Entradas (canal, endereço, motivo) para e-mail/telefone inválidos de um cadastro."""
+    problems = []
+    email = address_key("email", data.get("email"))
+    if email and not is_valid_email(email):
+        problems.append(("email", email, "E-mail inválido"))
+    phone = address_key("whatsapp", data.get("phone"))
+    if phone and not is_valid_phone(phone):
+        problems.append(("whatsapp", phone, "Telefone inválido"))
+    return problems
+
+
+def smtp_refusal(details):
+    """Recusa SMTP normalizada para "550 5.1.1 motivo" (aceita o formato antigo), ou None."""
+    details = (details or "").strip()
+    legacy = SMTP_LEGACY_REFUSED_RE.match(details)
+    if legacy:
+        details = f"{legacy.group(1)} {legacy.group(2)}"
+    return details if SMTP_REPLY_RE.match(details) else None
+
+
+def is_permanent_smtp_refusal(details):
+    # Apenas endereço ou caixa inexistente. Recusas de relay (5.7.x), política, cota (5.2.x)
+    # etc. também são 5xx, mas costumam vir de configuração errada ou bloqueio do provedor
+    # e suprimiriam todos os destinatários de uma vez.
+    refusal = smtp_refusal(details)
+    if not refusal:
+        return False
+    code, status = SMTP_REPLY_RE.match(refusal).groups()
+    status = status or next(iter(SMTP_ENHANCED_RE.findall(refusal)), None)
+    if status:
+        return status.startswith("5.1.") and status not in SMTP_SENDER_STATUSES
+    return code in SMTP_ADDRESS_CODES
+
+
+def permanent_failure(channel, details):
+    """Motivo da supressão se o resultado do envio for uma falha permanente, senão None."""
+    details = (details or "").strip()
+    if channel == "email" and is_permanent_smtp_refusal(details):
+        return smtp_refusal(details)[:200]
+    if channel == "whatsapp" and details.startswith(WHATSAPP_INVALID_PREFIX):
+        return details[:200]
+    return None
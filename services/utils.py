@@ -1,7 +1,20 @@
 import re
+from datetime import datetime
 
 def normalize_phone(phone: str) -> str:
     digits = re.sub(r"\D", "", phone)
     if digits.startswith("0"):
         digits = digits.lstrip("0")
     return digits
+
+def normalize_email(email) -> str:
+    if email is None:
+        return None
+    email = str(email).strip().lower()
+    return email or None
+
+def due_cutoff(now=None):
+    # Limite para "remind_at <= ?". A coluna é gravada como "AAAA-MM-DD HH:MM" e comparada
+    # como texto, então o limite usa o mesmo formato: com o separador "T" ele ficaria depois
+    # de todos os horários do dia e incluiria lembretes que ainda vão vencer hoje.
+    return (now or datetime.now()).isoformat(sep=' ', timespec='minutes')
@@ -1,24 +1,165 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from time import sleep
+import argparse
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from services.suppressions import WHATSAPP_INVALID_PREFIX
+
+# Perfil do Chrome reutilizado entre execuções: guarda a sessão do WhatsApp Web,
+# então o QR Code só precisa ser lido uma vez (python -m services.whatsapp_web --login)
+PROFILE_DIR_ENV = "GTR_WA_PROFILE_DIR"
+HEADLESS_ENV = "GTR_WA_HEADLESS"
+# Número de sessões independentes (cada uma é um aparelho conectado, com perfil e login próprios)
+POOL_SIZE_ENV = "GTR_WA_SESSIONS"
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "whatsapp_profile")
+
+# Estados do sender
+STOPPED = "stopped"
+NEEDS_LOGIN = "needs_login"
+READY = "ready"
+ERROR = "error"
+
+# Seletores da página: lista de conversas (sessão autenticada) e QR Code (login pendente)
+READY_SELECTOR = "#pane-side"
+QR_SELECTOR = "canvas[aria-label], div[data-ref]"
+MESSAGE_BOX_XPATH = "//div[@title='Mensagem']"
+# Popup "O número de telefone compartilhado por URL é inválido": restrito ao modal, para o
+# texto de uma conversa que contenha "inválido" não ser tomado pelo aviso
+INVALID_NUMBER_XPATH = (
+    "//div[@data-animate-modal-popup='true']"
+    "//div[contains(text(), 'compartilhado por url é inválido') or contains(text(), 'shared via url is invalid')]"
+)
+
+LOGIN_HINT = "WhatsApp Web precisa de login: execute `python -m services.whatsapp_web --login` e leia o QR Code."
+
+
+def profile_dir_from_env():
+    return os.environ.get(PROFILE_DIR_ENV) or DEFAULT_PROFILE_DIR
+
+
+def headless_from_env():
+    return os.environ.get(HEADLESS_ENV, "1").lower() not in ("0", "false", "no")
+
+
+def pool_size_from_env():
+    return max(int(os.environ.get(POOL_SIZE_ENV) or 1), 1)
+
+
+def session_profile_dir(profile_dir, index):
+    # A sessão 0 usa o próprio diretório (compatível com o perfil único); as demais, <dir>-<n>
+    return profile_dir if index == 0 else f"{profile_dir}-{index}"
+
 
 class WhatsAppWeb:
-    def __init__(self):
+    def __init__(self, profile_dir=None, headless=None, load_timeout=60, send_timeout=30):
+        self.profile_dir = profile_dir or profile_dir_from_env()
+        self.headless = headless_from_env() if headless is None else headless
+        self.load_timeout = load_timeout
+        self.send_timeout = send_timeout
         self.driver = None
+        self.state = STOPPED
+        self.details = ""
+
+    # O selenium é importado só ao abrir o navegador: quem apenas importa este módulo
+    # (reminders_service, testes, simulação) não depende dele
+    def _options(self):
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument(f"--user-data-dir={os.path.abspath(self.profile_dir)}")
+        if self.headless:
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1280,900")
+        return options
+
+    def start(self, login_timeout=0):
+        """Abre o WhatsApp Web com o perfil persistente e detecta o estado da sessão.
+
+        Não bloqueia esperando o usuário: sem sessão salva o estado fica NEEDS_LOGIN.
+        login_timeout > 0 espera esse tempo (segundos) pela leitura do QR Code.
+        Retorna o estado (READY, NEEDS_LOGIN ou ERROR).
+        """
+        os.makedirs(self.profile_dir, exist_ok=True)
+        try:
+            from selenium import webdriver
+
+            self.driver = webdriver.Chrome(options=self._options())
+            self.driver.get("https://web.whatsapp.com")
+            self._detect_state(self.load_timeout)
+            if self.state == NEEDS_LOGIN and login_timeout:
+                self._detect_state(login_timeout, until_ready=True)
+        except Exception as e:
+            self.state, self.details = ERROR, f"{e.__class__.__name__}: {e}"
+        return self.state
+
+    def _detect_state(self, timeout, until_ready=False):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        def found(driver):
+            if driver.find_elements(By.CSS_SELECTOR, READY_SELECTOR):
+                return READY
+            if not until_ready and driver.find_elements(By.CSS_SELECTOR, QR_SELECTOR):
+                return NEEDS_LOGIN
+            return False
+
+        try:
+            self.state = WebDriverWait(self.driver, timeout, poll_frequency=0.5).until(found)
+        except Exception:
+            self.state = NEEDS_LOGIN if until_ready else ERROR
+            if self.state == ERROR:
+                self.details = f"WhatsApp Web não carregou em {timeout}s."
+        if self.state == NEEDS_LOGIN:
+            self.details = LOGIN_HINT
+        elif self.state == READY:
+            self.details = ""
+
+    def is_alive(self):
+        if not self.driver:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
 
-    def start(self):
-        self.driver = webdriver.Chrome()
-        self.driver.get("https://web.whatsapp.com")
-        input("Após escanear o QR Code, pressione ENTER...")
+    def ensure_started(self):
+        # Para processos de longa duração (agendador): reaproveita o navegador aberto e só
+        # reinicia se ele caiu ou se a sessão ainda não estava autenticada. Fechar o navegador
+        # sem sessão libera o perfil para o `--login`.
+        if self.state == READY and self.is_alive():
+            return self.state
+        self.close()
+        self.start()
+        if self.state != READY:
+            state = self.state
+            self.close()
+            self.state = state
+        return self.state
 
     def send(self, number, message):
+        if self.state != READY:
+            return False, self.details or "WhatsApp Web não iniciado"
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from selenium.webdriver.support.ui import WebDriverWait
+
         try:
-            url = f"https://web.whatsapp.com/send?phone={number}&text={message}"
+            url = f"https://web.whatsapp.com/send?phone={number}&text={quote(message)}"
             self.driver.get(url)
-            sleep(7)
 
-            box = self.driver.find_element(By.XPATH, "//div[@title='Mensagem']")
+            # Espera a caixa de mensagem (ou o aviso de número inválido) em vez de um tempo fixo
+            def loaded(driver):
+                boxes = driver.find_elements(By.XPATH, MESSAGE_BOX_XPATH)
+                if boxes:
+                    return boxes[0]
+                if driver.find_elements(By.XPATH, INVALID_NUMBER_XPATH):
+                    raise ValueError(f"{WHATSAPP_INVALID_PREFIX}: {number}")
+                return False
+
+            box = WebDriverWait(self.driver, self.send_timeout, poll_frequency=0.25).until(loaded)
             box.send_keys(Keys.ENTER)
             return True, "Sent"
 
@@ -27,4 +168,109 @@ class WhatsAppWeb:
 
     def close(self):
         if self.driver:
-            self.driver.quit()
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+        self.state = STOPPED
+
+
+class WhatsAppPool:
+    """Várias sessões WhatsAppWeb independentes usadas em paralelo.
+
+    Mesma interface do WhatsAppWeb (ensure_started/send/close/state/details), mais `size`,
+    o número de envios simultâneos. send() pode ser chamado de várias threads: cada chamada
+    usa uma sessão livre. Uma sessão cujo navegador caiu é reiniciada; se não voltar
+    autenticada, sai do pool até o próximo ensure_started().
+    """
+
+    def __init__(self, size=None, profile_dir=None, headless=None, **options):
+        base = profile_dir or profile_dir_from_env()
+        self.sessions = [
+            WhatsAppWeb(profile_dir=session_profile_dir(base, i), headless=headless, **options)
+            for i in range(size or pool_size_from_env())
+        ]
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._healthy = 0
+
+    @property
+    def size(self):
+        return max(self._healthy, 1)
+
+    @property
+    def state(self):
+        return READY if self._healthy else (self.sessions[0].state if self.sessions else STOPPED)
+
+    @property
+    def details(self):
+        problems = [f"sessão {i}: {s.details}" for i, s in enumerate(self.sessions) if s.state != READY and s.details]
+        return "; ".join(problems)
+
+    def ensure_started(self):
+        # Verifica todas as sessões (em paralelo, a abertura do navegador é lenta) e
+        # reinicia as que caíram ou ainda não estavam autenticadas
+        with ThreadPoolExecutor(max_workers=len(self.sessions)) as executor:
+            list(executor.map(lambda s: s.ensure_started(), self.sessions))
+        with self._lock:
+            self._idle = queue.Queue()
+            for session in self.sessions:
+                if session.state == READY:
+                    self._idle.put(session)
+            self._healthy = self._idle.qsize()
+        return self.state
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                if not self._healthy:
+                    return None
+                idle = self._idle
+            try:
+                return idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def send(self, number, message):
+        session = self._acquire()
+        if session is None:
+            return False, self.details or "Nenhuma sessão do WhatsApp Web disponível"
+        success, details = session.send(number, message)
+        if not success and not session.is_alive():
+            # Sessão com problema: tenta substituí-la por um navegador novo no mesmo perfil
+            session.ensure_started()
+        with self._lock:
+            if session.state == READY:
+                self._idle.put(session)
+            else:
+                self._healthy -= 1
+        return success, details
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+        with self._lock:
+            self._idle = queue.Queue()
+            self._healthy = 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sessão persistente do WhatsApp Web")
+    parser.add_argument("--profile-dir", default=None, help=f"padrão: ${PROFILE_DIR_ENV} ou {DEFAULT_PROFILE_DIR}")
+    parser.add_argument("--login", action="store_true", help="abre o navegador visível para ler o QR Code")
+    parser.add_argument("--session", type=int, default=0, help=f"sessão do pool (0 a {POOL_SIZE_ENV}-1); cada uma tem login próprio")
+    parser.add_argument("--timeout", type=int, default=300, help="segundos de espera pelo login")
+    args = parser.parse_args(argv)
+
+    # Sem --login apenas verifica (em modo headless) se a sessão salva está autenticada
+    profile_dir = session_profile_dir(args.profile_dir or profile_dir_from_env(), args.session)
+    wa = WhatsAppWeb(profile_dir=profile_dir, headless=False if args.login else None)
+    state = wa.start(login_timeout=args.timeout if args.login else 0)
+    print(f"{state}: {wa.details}" if wa.details else state)
+    wa.close()
+    raise SystemExit(0 if state == READY else 1)
+
+
+if __name__ == "__main__":
+    main()
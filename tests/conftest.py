@@ -0,0 +1,12 @@
+import pytest
+
+from database import connection
+from database.init_db import init_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Banco SQLite vazio em um diretório temporário, usado por get_conn()."""
+    monkeypatch.setattr(connection, "DB_PATH", str(tmp_path / "gtr_test.db"))
+    init_db()
+    return connection
@@ -0,0 +1,64 @@
+import sqlite3
+
+from database import connection
+from database.init_db import init_db
+from database.models import get_delivery_stats
+
+
+def stats_by_outcome():
+    counts = {}
+    for row in get_delivery_stats():
+        key = "skipped" if row["skipped"] else ("sent" if row["success"] else "failed")
+        counts[key] = counts.get(key, 0) + row["count"]
+    return counts
+
+
+def test_skipped_sends_are_counted_apart_from_failures(db):
+    conn = db.get_conn()
+    conn.execute("INSERT INTO users (id, name, utec) VALUES (1, 'Ana', 'UTEC PINA')")
+    conn.executemany("INSERT INTO sent_log (user_id, sent_at, channel, success, skipped, details) VALUES (1, '2026-10-19T08:00', 'email', ?, ?, ?)", [
+        (1, 0, "Sent"),
+        (0, 0, "550 5.7.1 Relaying denied"),
+        (0, 1, "Suprimido: 550 5.1.1 User unknown"),
+        (0, 1, "not attempted"),
+    ])
+    conn.commit()
+    conn.close()
+
+    assert stats_by_outcome() == {"sent": 1, "failed": 1, "skipped": 2}
+
+
+def test_existing_database_is_migrated(tmp_path, monkeypatch):
+    # Banco criado antes da coluna skipped: sent_log sem a coluna e delivery_stats com a chave antiga
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, birthdate TEXT, role TEXT, utec TEXT, email TEXT, phone TEXT);
+        CREATE TABLE sent_log (id INTEGER PRIMARY KEY, user_id INTEGER, reminder_id INTEGER, sent_at TEXT,
+                               channel TEXT, success INTEGER, details TEXT);
+        CREATE TABLE delivery_stats (day TEXT NOT NULL, channel TEXT NOT NULL, utec TEXT NOT NULL DEFAULT '',
+                                     success INTEGER NOT NULL, count INTEGER NOT NULL DEFAULT 0,
+                                     PRIMARY KEY (day, channel, utec, success));
+        INSERT INTO users (id, name) VALUES (1, 'Ana');
+        INSERT INTO sent_log (user_id, sent_at, channel, success, details) VALUES
+            (1, '2026-10-19T08:00', 'email', 1, 'Sent'),
+            (1, '2026-10-19T08:00', 'email', 0, '[Errno 111] Connection refused'),
+            (1, '2026-10-19T08:00', 'whatsapp', 0, 'Suprimido: Telefone inválido'),
+            (1, '2026-10-19T08:00', 'whatsapp', 0, 'not attempted');
+        INSERT INTO delivery_stats VALUES ('2026-10-19', 'email', '', 1, 1), ('2026-10-19', 'email', '', 0, 1),
+                                          ('2026-10-19', 'whatsapp', '', 0, 2);
+    """)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(connection, "DB_PATH", path)
+
+    init_db()
+    assert stats_by_outcome() == {"sent": 1, "failed": 1, "skipped": 2}
+
+    # O gatilho recriado continua atualizando os contadores
+    conn = connection.get_conn()
+    conn.execute("INSERT INTO sent_log (user_id, sent_at, channel, success, skipped, details) VALUES (1, '2026-10-19T09:00', 'email', 0, 1, 'Suprimido: x')")
+    conn.commit()
+    conn.close()
+    init_db()
+    assert stats_by_outcome() == {"sent": 1, "failed": 1, "skipped": 3}
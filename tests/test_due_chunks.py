@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from services.reminders_service import process_reminders
+
+NOW = datetime(2026, 10, 19, 9, 0)
+
+# Vários lembretes no mesmo minuto, fora da ordem de id: com blocos de 3 o mesmo remind_at
+# fica dividido entre blocos
+REMIND_ATS = ["08:30", "08:00", "08:30", "08:30", "07:00", "08:00", "08:30", "08:30", "08:00", "08:30"]
+
+
+@pytest.mark.parametrize("priority", ["normal", "bulk"])
+def test_keyset_paging_visits_each_due_reminder_once(db, priority):
+    conn = db.get_conn()
+    conn.execute("INSERT INTO users (name, email) VALUES ('Ana', 'ana@example.org')")
+    conn.executemany("INSERT INTO reminders (user_id, title, remind_at, channel, priority) VALUES (1, 't', ?, 'email', ?)",
+                     [(f"2026-10-19 {hhmm}", priority) for hhmm in REMIND_ATS])
+    conn.commit()
+    conn.close()
+
+    ids = []
+    process_reminders({}, dry_run=True, now=NOW, chunk_size=3, bulk_share=0,
+                      on_result=lambda e: ids.append(e["reminder_id"]))
+
+    # Cada lembrete uma única vez, na ordem (remind_at, id)
+    assert ids == sorted(range(1, len(REMIND_ATS) + 1), key=lambda i: (REMIND_ATS[i - 1], i))
+    conn = db.get_conn()
+    assert conn.execute("SELECT COUNT(*) FROM reminders WHERE sent = 0").fetchone()[0] == 0
+    conn.close()
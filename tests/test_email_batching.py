@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from benchmarks.fakes import FakeWhatsAppSender, SMTPSink
+from services.reminders_service import process_reminders
+
+NOW = datetime(2026, 10, 19, 9, 0)
+
+
+class RecordingEmailSender:
+    """Guarda cada mensagem individual (send) e cada lote (send_batch) recebidos."""
+
+    def __init__(self):
+        self.messages = []
+        self.batches = []
+
+    def send(self, to, subject, body):
+        self.messages.append((to, subject))
+        return True, "Sent"
+
+    def send_batch(self, recipients, subject, body, max_recipients=50):
+        self.batches.append((list(recipients), subject))
+        return {email: (True, "Sent") for email in recipients}
+
+
+def add_users_and_reminders(db, users, reminders):
+    """users: [(nome, e-mail, telefone)]; reminders: [(user_id, título, canal)], todos vencidos."""
+    conn = db.get_conn()
+    conn.executemany("INSERT INTO users (name, email, phone) VALUES (?, ?, ?)", users)
+    conn.executemany("INSERT INTO reminders (user_id, title, description, remind_at, channel) VALUES (?, ?, 'Pauta', '2026-10-19 08:00', ?)",
+                     reminders)
+    conn.commit()
+    conn.close()
+
+
+def log_and_pending(db):
+    conn = db.get_conn()
+    log = conn.execute("SELECT reminder_id, channel, success, details FROM sent_log ORDER BY reminder_id, channel").fetchall()
+    pending = conn.execute("SELECT COUNT(*) FROM reminders WHERE sent = 0").fetchone()[0]
+    conn.close()
+    return [tuple(row) for row in log], pending
+
+
+def run(smtp_cfg=None, **options):
+    return process_reminders(smtp_cfg or {}, now=NOW, wa_sender=FakeWhatsAppSender(), **options)
+
+
+def test_batch_email_splits_recipients_into_envelopes(db):
+    users = [(f"Usuário {n}", f"u{n}@example.org", None) for n in range(5)]
+    add_users_and_reminders(db, users, [(n + 1, "Reunião", "email") for n in range(5)] + [(1, "Treinamento", "email")])
+
+    with SMTPSink() as sink:
+        summary = run({**sink.smtp_cfg(), "batch_max_recipients": 2}, batch_email=True)
+
+    # "Reunião": 5 destinatários em envelopes de até 2; "Treinamento": outro conteúdo, outro lote
+    assert (sink.messages, sink.recipients) == (3 + 1, 5 + 1)
+    assert summary["sent"] == 6
+    log, pending = log_and_pending(db)
+    assert [row[0] for row in log] == [1, 2, 3, 4, 5, 6]
+    assert {row[3] for row in log} == {"Sent (batch of 2)", "Sent (batch of 1)"}
+    assert pending == 0
+
+
+def test_batch_email_groups_only_identical_content(db):
+    add_users_and_reminders(db, [("Ana", "ana@example.org", None), ("Bruno", "bruno@example.org", None)],
+                            [(1, "Reunião", "email"), (2, "Reunião", "email"), (2, "Treinamento", "email")])
+    sender = RecordingEmailSender()
+
+    run(batch_email=True, email_sender=sender)
+
+    assert sorted(sender.batches) == [(["ana@example.org", "bruno@example.org"], "Lembrete: Reunião"),
+                                      (["bruno@example.org"], "Lembrete: Treinamento")]
+    assert sender.messages == []
+    assert log_and_pending(db)[1] == 0
+
+
+def test_digest_sends_one_message_per_user_and_channel(db):
+    add_users_and_reminders(db, [("Ana", "ana@example.org", "81999990001"), ("Bruno", "bruno@example.org", None)],
+                            [(1, "Reunião", "both"), (1, "Treinamento", "email"), (1, "Oficina", "whatsapp"), (2, "Reunião", "email")])
+    sender = RecordingEmailSender()
+    wa = FakeWhatsAppSender()
+
+    summary = process_reminders({}, now=NOW, digest=True, email_sender=sender, wa_sender=wa)
+
+    assert sorted(sender.messages) == [("ana@example.org", "Você tem 2 lembretes"), ("bruno@example.org", "Lembrete: Reunião")]
+    assert wa.messages == 1
+    # O resultado continua registrado por lembrete e canal
+    log, pending = log_and_pending(db)
+    assert [(row[0], row[1]) for row in log] == [(1, "email"), (1, "whatsapp"), (2, "email"), (3, "whatsapp"), (4, "email")]
+    assert (summary["sent"], pending) == (5, 0)
+
+
+def test_digest_groups_within_each_chunk(db):
+    add_users_and_reminders(db, [("Ana", "ana@example.org", None)], [(1, f"Lembrete {n}", "email") for n in range(3)])
+    sender = RecordingEmailSender()
+
+    # bulk_share=0: o bloco inteiro vai para a faixa "normal"
+    run(digest=True, email_sender=sender, chunk_size=2, bulk_share=0)
+
+    assert [subject for _, subject in sender.messages] == ["Você tem 2 lembretes", "Lembrete: Lembrete 2"]
+    assert log_and_pending(db)[1] == 0
+
+
+def test_digest_with_batch_email_shares_identical_digests(db):
+    add_users_and_reminders(db, [("Ana", "ana@example.org", None), ("Bruno", "bruno@example.org", None)],
+                            [(user_id, title, "email") for user_id in (1, 2) for title in ("Reunião", "Treinamento")])
+    sender = RecordingEmailSender()
+
+    run(digest=True, batch_email=True, email_sender=sender)
+
+    # Um item por lembrete; send_email_batch remove os endereços repetidos
+    assert [(sorted(set(recipients)), subject) for recipients, subject in sender.batches] == [
+        (["ana@example.org", "bruno@example.org"], "Você tem 2 lembretes")]
+    log, pending = log_and_pending(db)
+    assert (len(log), pending) == (4, 0)
@@ -0,0 +1,53 @@
+from database.models import import_users, list_users, search_users
+
+
+def user(name, email, phone=None, role="Coordenador"):
+    return {"name": name, "email": email, "phone": phone, "role": role, "utec": "UTEC PINA", "birthdate": "1990-05-01"}
+
+
+def test_reimport_is_idempotent(db):
+    rows = [(2, user("Ana", "ana@example.org", "81999990001")), (3, user("Bruno", "bruno@example.org"))]
+
+    first = import_users(rows)
+    assert (first["inserted"], first["updated"], first["unchanged"]) == (2, 0, 0)
+
+    second = import_users(rows)
+    assert (second["inserted"], second["updated"], second["unchanged"]) == (0, 0, 2)
+    assert len(list_users()) == 2
+
+
+def test_matches_by_normalized_email_then_phone(db):
+    import_users([(2, user("Ana", "ana@example.org", "81999990001")), (3, user("Bruno", "bruno@example.org", "81999990002"))])
+
+    summary = import_users([
+        (2, user("Ana Maria", " ANA@Example.org ", "81999990001")),
+        # e-mail novo, telefone de um cadastro existente: atualiza o Bruno
+        (3, user("Bruno Lima", "bruno.lima@example.org", "81999990002")),
+    ])
+
+    assert (summary["inserted"], summary["updated"]) == (0, 2)
+    assert sorted(u["name"] for u in list_users()) == ["Ana Maria", "Bruno Lima"]
+    assert [u["email"] for u in search_users("Lima")] == ["bruno.lima@example.org"]
+
+
+def test_duplicates_in_file_keep_last_row(db):
+    rows = [
+        (2, user("Ana", "ana@example.org")),
+        (3, user("Ana Atualizada", "Ana@example.org", role="Outro")),
+        (4, user("Bruno", "bruno@example.org")),
+    ]
+
+    first = import_users(rows)
+    assert (first["inserted"], first["updated"], first["duplicates"]) == (2, 0, 1)
+    assert first["errors"] == [(2, "Usuário repetido no arquivo (vale a linha 3).")]
+    assert sorted(u["name"] for u in list_users()) == ["Ana Atualizada", "Bruno"]
+
+    again = import_users(rows)
+    assert (again["inserted"], again["updated"], again["unchanged"], again["duplicates"]) == (0, 0, 2, 1)
+
+
+def test_rows_without_name_or_email_are_rejected(db):
+    summary = import_users([(2, user("", "x@example.org")), (3, user("Sem Email", None)), (4, user("Ana", "ana@example.org"))])
+
+    assert (summary["inserted"], summary["rejected"]) == (1, 2)
+    assert [line for line, _ in summary["errors"]] == [2, 3]
@@ -0,0 +1,42 @@
+import os
+import threading
+import time
+
+from services import jobs
+
+
+def test_only_one_job_claims_the_lock(db):
+    claimed = []
+    threads = [threading.Thread(target=lambda: claimed.append(jobs.claim_job("scheduler", True, pid=os.getpid())))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len([job_id for job_id in claimed if job_id]) == 1
+
+
+def test_job_of_dead_process_releases_the_lock(db):
+    job_id = jobs.claim_job("scheduler", True, pid=os.getpid())
+    conn = db.get_conn()
+    conn.execute("UPDATE jobs SET status = 'running', pid = ? WHERE id = ?", (2 ** 22 + 1, job_id))
+    conn.commit()
+    conn.close()
+
+    assert jobs.claim_job("scheduler", True, pid=os.getpid()) is not None
+    assert jobs.get_job(job_id)["status"] == "failed"
+
+
+def test_finished_workers_are_reaped(db):
+    job_id = jobs.start_processing_job({}, dry_run=True)
+    deadline = time.monotonic() + 30
+    while jobs.get_active_job() and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    assert jobs.get_job(job_id)["status"] not in jobs.ACTIVE_STATUSES
+    # O status final é gravado pouco antes de o worker sair: list_jobs recolhe o processo assim que ele termina
+    while jobs._processes and time.monotonic() < deadline:
+        jobs.list_jobs()
+        time.sleep(0.05)
+    assert jobs._processes == {}
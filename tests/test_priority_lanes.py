@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from services.reminders_service import process_reminders
+
+NOW = datetime(2026, 10, 19, 9, 0)
+
+
+def add_due(db, counts):
+    """Lembretes de e-mail vencidos por faixa; os de maior prioridade vencem por último."""
+    conn = db.get_conn()
+    conn.execute("INSERT INTO users (name, email) VALUES ('Ana', 'ana@example.org')")
+    minute = 0
+    for priority in ("bulk", "normal", "urgent"):
+        for _ in range(counts.get(priority, 0)):
+            remind_at = (NOW - timedelta(hours=1) + timedelta(minutes=minute)).isoformat(sep=' ', timespec='minutes')
+            conn.execute("INSERT INTO reminders (user_id, title, remind_at, channel, priority) VALUES (1, ?, ?, 'email', ?)",
+                         (priority, remind_at, priority))
+            minute += 1
+    conn.commit()
+    conn.close()
+
+
+def sent_order(**options):
+    ids = []
+    process_reminders({}, dry_run=True, now=NOW, on_result=lambda e: ids.append(e["reminder_id"]), **options)
+    return ids
+
+
+def lane_letters(db, ids):
+    conn = db.get_conn()
+    priority = dict(conn.execute("SELECT id, priority FROM reminders").fetchall())
+    conn.close()
+    return "".join(priority[i][0] for i in ids)
+
+
+def test_chunks_reserve_bulk_share_until_high_lanes_drain(db):
+    add_due(db, {"urgent": 3, "normal": 20, "bulk": 10})
+
+    order = lane_letters(db, sent_order(chunk_size=10, bulk_share=0.2))
+
+    assert order == (
+        "uuu" "nnnnn" "bb"      # urgent não enche o bloco: normal usa a sobra, bulk fica com sua cota
+        "nnnnnnnn" "bb"         # cota de 20% (2 de 10) para bulk enquanto há normal
+        "nnnnnnn" "bb"          # normal se esgota neste bloco
+        "bbbb"                  # o restante do bulk
+    )
+
+
+def test_urgent_goes_first_even_when_due_later(db):
+    add_due(db, {"urgent": 2, "normal": 4, "bulk": 4})
+
+    order = lane_letters(db, sent_order(chunk_size=5, bulk_share=0.2))
+
+    assert order.startswith("uu")
+    assert order.count("u") == 2 and order.count("n") == 4 and order.count("b") == 4
+
+
+def test_zero_bulk_share_starves_bulk_until_the_end(db):
+    add_due(db, {"urgent": 2, "normal": 12, "bulk": 5})
+
+    order = lane_letters(db, sent_order(chunk_size=4, bulk_share=0))
+
+    assert order == "uu" + "n" * 12 + "b" * 5
+
+
+def test_not_yet_due_reminders_are_left_pending(db):
+    add_due(db, {"normal": 2})
+    conn = db.get_conn()
+    conn.execute("INSERT INTO reminders (user_id, title, remind_at, channel, priority) VALUES (1, 'later', ?, 'email', 'urgent')",
+                 ((NOW + timedelta(minutes=30)).isoformat(sep=' ', timespec='minutes'),))
+    conn.commit()
+    conn.close()
+
+    assert lane_letters(db, sent_order(chunk_size=10)) == "nn"
@@ -0,0 +1,41 @@
+import threading
+
+from services.profiling import StatementTracer, profiled
+
+
+def test_tracer_aggregates_per_statement():
+    tracer = StatementTracer()
+    for rows in (1, 2, 3):
+        tracer.record("SELECT *\n  FROM users WHERE id = ?", 0.001 * rows, rows)
+
+    [stats] = tracer.aggregate()
+    assert stats["sql"] == "SELECT * FROM users WHERE id = ?"
+    assert (stats["calls"], stats["rows"]) == (3, 6)
+    assert round(stats["max_seconds"], 6) == 0.003
+    assert tracer.statements == 3
+
+
+def test_concurrent_profiles_do_not_mix_statements(db, tmp_path):
+    barrier = threading.Barrier(2)
+    tracers = {}
+
+    def render(name, sql):
+        with profiled(name, str(tmp_path)) as tracer:
+            barrier.wait()
+            for _ in range(20):
+                conn = db.get_conn()
+                conn.execute(sql).fetchall()
+                conn.close()
+            barrier.wait()
+        tracers[name] = tracer
+
+    threads = [threading.Thread(target=render, args=(name, f"SELECT {n}")) for n, name in enumerate(("a", "b"))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [s["sql"] for s in tracers["a"].aggregate()] == ["SELECT 0"]
+    assert [s["sql"] for s in tracers["b"].aggregate()] == ["SELECT 1"]
+    # Nenhum rastreador fica instalado depois dos perfis
+    assert type(db.get_conn()).__name__ == "Connection"
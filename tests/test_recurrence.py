@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+import pytest
+
+from services.recurrence import build_rule, next_occurrence
+
+
+def test_monthly_clamps_to_last_day_and_returns_to_requested_day():
+    rule = build_rule("monthly", day=31)
+    now = datetime(2026, 1, 31, 9, 0)
+
+    feb, n = next_occurrence(rule, datetime(2026, 1, 31, 9, 0), 1, now)
+    assert (feb, n) == (datetime(2026, 2, 28, 9, 0), 2)
+
+    # Fevereiro não "encurta" a série: março volta ao dia 31
+    mar, n = next_occurrence(rule, feb, n, feb)
+    assert (mar, n) == (datetime(2026, 3, 31, 9, 0), 3)
+
+    apr, _ = next_occurrence(rule, mar, n, mar)
+    assert apr == datetime(2026, 4, 30, 9, 0)
+
+
+def test_monthly_clamps_in_leap_year_and_wraps_year():
+    rule = build_rule("monthly", day=30, interval=2)
+    nxt, _ = next_occurrence(rule, datetime(2027, 12, 30, 8, 0), 1, datetime(2027, 12, 30, 8, 0))
+    assert nxt == datetime(2028, 2, 29, 8, 0)
+
+
+def test_weekly_moves_to_next_listed_day_in_same_week():
+    rule = build_rule("weekly", weekdays=[4, 0], interval=2)  # segunda e sexta
+    monday = datetime(2026, 10, 19, 10, 0)
+    nxt, n = next_occurrence(rule, monday, 1, monday)
+    assert (nxt, n) == (datetime(2026, 10, 23, 10, 0), 2)
+
+
+def test_weekly_interval_wraps_to_first_day_after_interval_weeks():
+    rule = build_rule("weekly", weekdays=[0, 4], interval=2)
+    friday = datetime(2026, 10, 23, 10, 0)
+    nxt, _ = next_occurrence(rule, friday, 2, friday)
+    assert nxt == datetime(2026, 11, 2, 10, 0)
+
+
+def test_past_occurrences_are_skipped_but_counted():
+    rule = build_rule("daily")
+    current = datetime(2026, 10, 1, 8, 0)
+    nxt, n = next_occurrence(rule, current, 1, datetime(2026, 10, 5, 12, 0))
+    assert (nxt, n) == (datetime(2026, 10, 6, 8, 0), 6)
+
+
+def test_count_ends_the_series():
+    rule = build_rule("daily", count=3)
+    start = datetime(2026, 10, 1, 8, 0)
+    assert next_occurrence(rule, start, 2, start) == (datetime(2026, 10, 2, 8, 0), 3)
+    assert next_occurrence(rule, start, 3, start) == (None, None)
+    # Ocorrências puladas também consomem o limite
+    assert next_occurrence(rule, start, 1, datetime(2026, 10, 10)) == (None, None)
+
+
+def test_until_is_inclusive():
+    rule = build_rule("daily", until=date(2026, 10, 3))
+    assert next_occurrence(rule, datetime(2026, 10, 2, 23, 0), 1, datetime(2026, 10, 2, 23, 0))[0] == datetime(2026, 10, 3, 23, 0)
+    assert next_occurrence(rule, datetime(2026, 10, 3, 8, 0), 2, datetime(2026, 10, 3, 8, 0)) == (None, None)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"freq": "yearly"},
+    {"freq": "weekly"},
+    {"freq": "monthly", "day": 32},
+])
+def test_build_rule_rejects_invalid_rules(kwargs):
+    with pytest.raises(ValueError):
+        build_rule(**kwargs)
@@ -0,0 +1,103 @@
+from database.init_db import init_db, rebuild_search_index
+from database.models import (
+    add_reminder, add_user, count_reminders, delete_reminder, delete_user, import_users, list_reminders_page,
+    list_users_page, search_reminders, search_users, update_reminder, update_user,
+)
+
+
+def user(name, **fields):
+    return {"name": name, "birthdate": None, "role": "Analista", "utec": "UTEC PINA",
+            "email": None, "phone": None, **fields}
+
+
+def names(rows):
+    return sorted(row["name"] for row in rows)
+
+
+def test_user_search_follows_add_update_and_delete(db):
+    add_user(user("Ana Conceição", email="ana@example.com"))
+    add_user(user("Bruno Silva", role="Coordenador"))
+    ana = search_users("ana")[0]
+
+    # Prefixo, sem acento e em qualquer campo indexado
+    assert names(search_users("concei")) == ["Ana Conceição"]
+    assert names(search_users("ana@exa")) == ["Ana Conceição"]
+    assert names(search_users("coord")) == ["Bruno Silva"]
+    assert names(search_users("pina")) == ["Ana Conceição", "Bruno Silva"]
+    assert names(search_users("ana silva")) == []
+
+    update_user(ana["id"], user("Ana Souza", email="ana@example.com"))
+    assert search_users("concei") == []
+    assert names(search_users("souza")) == ["Ana Souza"]
+
+    delete_user(ana["id"])
+    assert search_users("ana") == []
+    assert search_users("") == []
+
+
+def test_imported_users_are_searchable(db):
+    import_users([(2, user("Carla Dias", email="carla@example.com"))])
+    assert names(search_users("dias")) == ["Carla Dias"]
+
+
+def test_reminder_search_follows_add_update_and_delete(db):
+    add_user(user("Ana"))
+    add_reminder({"user_id": 1, "title": "Reunião de equipe", "description": "Pauta trimestral",
+                  "remind_at": "2026-10-19 08:00", "channel": "email"})
+
+    [found] = search_reminders("reuniao trimes")
+    assert (found["title"], found["user_name"]) == ("Reunião de equipe", "Ana")
+
+    update_reminder(found["id"], {"user_id": 1, "title": "Treinamento", "description": None,
+                                  "remind_at": "2026-10-19 08:00", "channel": "email"})
+    assert search_reminders("reuniao") == []
+    assert [r["title"] for r in search_reminders("trein")] == ["Treinamento"]
+
+    delete_reminder(found["id"])
+    assert search_reminders("trein") == []
+
+
+def test_init_db_keeps_index_and_rebuild_picks_up_direct_writes(db):
+    add_user(user("Ana"))
+    conn = db.get_conn()
+    conn.execute("INSERT INTO users (name) VALUES ('Daniel')")
+    conn.commit()
+    conn.close()
+
+    # init_db não varre as tabelas quando o índice já existe
+    init_db()
+    assert search_users("daniel") == []
+    assert names(search_users("ana")) == ["Ana"]
+
+    rebuild_search_index()
+    assert names(search_users("daniel")) == ["Daniel"]
+    assert names(search_users("ana")) == ["Ana"]
+
+
+def test_index_is_built_for_databases_created_before_fts(db):
+    add_user(user("Ana"))
+    conn = db.get_conn()
+    conn.execute("DROP TABLE users_fts")
+    conn.execute("DROP TABLE reminders_fts")
+    conn.commit()
+    conn.close()
+
+    init_db()
+    assert names(search_users("ana")) == ["Ana"]
+
+
+def test_browse_pages_without_query(db):
+    for n in range(5):
+        add_user(user(f"Usuário {n}"))
+        add_reminder({"user_id": n + 1, "title": f"Lembrete {n}", "description": None,
+                      "remind_at": "2026-10-19 08:00", "channel": "email"})
+
+    pages = [list_users_page(page, per_page=2) for page in (1, 2, 3)]
+    assert [[row["name"] for row in rows] for rows in pages] == [
+        ["Usuário 4", "Usuário 3"], ["Usuário 2", "Usuário 1"], ["Usuário 0"]]
+
+    assert count_reminders() == 5
+    [first, second] = list_reminders_page(1, per_page=2)
+    assert (first["title"], first["user_name"]) == ("Lembrete 4", "Usuário 4")
+    assert second["title"] == "Lembrete 3"
+    assert list_reminders_page(4, per_page=2) == []
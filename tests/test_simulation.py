@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from benchmarks.fakes import FakeWhatsAppSender, SMTPSink
+from services.reminders_service import process_reminders
+from services.simulation import simulate
+
+NOW = datetime(2026, 10, 19, 9, 0)
+
+
+def test_simulated_batch_matches_real_smtp(db):
+    # Dois usuários com o mesmo e-mail: o envio em lote manda uma única cópia para o endereço
+    conn = db.get_conn()
+    conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)", [
+        ("Ana", "compartilhado@example.org"), ("Bruno", "compartilhado@example.org"), ("Carla", "carla@example.org"),
+    ])
+    conn.executemany("INSERT INTO reminders (user_id, title, remind_at, channel) VALUES (?, 'Reunião', '2026-10-19 08:00', 'email')",
+                     [(1,), (2,), (3,)])
+    conn.commit()
+    conn.close()
+
+    report = simulate(at=NOW, smtp_cfg={"batch_max_recipients": 1}, batch_email=True)
+    with SMTPSink() as sink:
+        summary = process_reminders({**sink.smtp_cfg(), "batch_max_recipients": 1}, batch_email=True, now=NOW,
+                                    wa_sender=FakeWhatsAppSender())
+
+    assert (report["channels"]["email"]["messages"], report["channels"]["email"]["recipients"]) == (sink.messages, sink.recipients) == (2, 2)
+    assert (report["sent"], report["failed"], report["skipped"]) == (summary["sent"], summary["failed"], summary["skipped"]) == (3, 0, 0)
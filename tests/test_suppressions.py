@@ -0,0 +1,134 @@
+from datetime import datetime
+
+import pytest
+
+from benchmarks.fakes import FakeWhatsAppSender
+from database.init_db import init_db
+from services.reminders_service import process_reminders
+from services.suppressions import permanent_failure
+
+NOW = datetime(2026, 10, 19, 9, 0)
+
+
+@pytest.mark.parametrize("details", [
+    "550 5.1.1 User unknown",
+    "550-5.1.1 The email account that you tried to reach does not exist",
+    "550 5.1.10 Recipient address rejected: null MX",
+    "553 5.1.3 Bad recipient address syntax",
+    "550 User unknown",
+    "553 mailbox name not allowed",
+    "{'ana@example.org': (550, b'5.1.1 User unknown')}",
+])
+def test_address_refusals_are_permanent(details):
+    assert permanent_failure("email", details)
+
+
+@pytest.mark.parametrize("details", [
+    "550 5.7.1 Relaying denied",
+    "554 5.7.1 Message rejected by policy",
+    "552 5.2.2 Mailbox full",
+    "550 Requested action not taken: 5.7.1 blocked",
+    "550 5.1.8 Bad sender address",
+    "551 User not local",
+    "554 Transaction failed",
+    "421 4.7.0 Try again later",
+    "{'ana@example.org': (550, b'5.7.1 Relaying denied')}",
+    "[Errno 111] Connection refused",
+    "",
+    None,
+])
+def test_other_email_failures_are_not_permanent(details):
+    assert permanent_failure("email", details) is None
+
+
+def test_whatsapp_invalid_number_is_permanent():
+    assert permanent_failure("whatsapp", "Número inválido no WhatsApp: 5581999990000")
+    assert permanent_failure("whatsapp", "TimeoutException: ") is None
+    # O código SMTP não vale para o WhatsApp
+    assert permanent_failure("whatsapp", "550 5.1.1 User unknown") is None
+
+
+def add_user(conn, name, email, phone=None):
+    return conn.execute("INSERT INTO users (name, email, phone) VALUES (?, ?, ?)", (name, email, phone)).lastrowid
+
+
+def suppressed(db):
+    conn = db.get_conn()
+    rows = {(r["channel"], r["address"]): r["reason"] for r in conn.execute("SELECT * FROM suppressions")}
+    conn.close()
+    return rows
+
+
+def test_backfill_suppresses_only_permanent_failures_from_sent_log(db):
+    conn = db.get_conn()
+    conn.execute("DROP TABLE suppressions")
+    log = [
+        (add_user(conn, "Ana", " Ana@Example.org "), "email", "550 5.1.1 User unknown"),
+        (add_user(conn, "Bruno", "bruno@example.org"), "email", "{'bruno@example.org': (550, b'5.1.1 User unknown')}"),
+        (add_user(conn, "Carla", "carla@example.org"), "email", "550 5.7.1 Relaying denied"),
+        (add_user(conn, "Diego", "diego@example.org"), "email", "[Errno 111] Connection refused"),
+        (add_user(conn, "Eduarda", "eduarda@example.org", "5581999990005"), "whatsapp", "Número inválido no WhatsApp: 5581999990005"),
+        (add_user(conn, "Felipe", "felipe@example.org", "5581999990006"), "birthday", "Número inválido no WhatsApp: 5581999990006"),
+    ]
+    conn.executemany("INSERT INTO sent_log (user_id, channel, success, details, sent_at) VALUES (?, ?, 0, ?, '2026-01-01T08:00:00')", log)
+    conn.commit()
+    conn.close()
+
+    init_db()
+
+    assert set(suppressed(db)) == {
+        ("email", "ana@example.org"),
+        ("email", "bruno@example.org"),
+        ("whatsapp", "5581999990005"),
+        ("whatsapp", "5581999990006"),
+    }
+    assert suppressed(db)[("email", "bruno@example.org")] == "550 5.1.1 User unknown"
+
+
+def test_backfill_runs_only_when_the_table_is_created(db):
+    conn = db.get_conn()
+    user_id = add_user(conn, "Ana", "ana@example.org")
+    conn.execute("INSERT INTO sent_log (user_id, channel, success, details, sent_at) VALUES (?, 'email', 0, '550 5.1.1 User unknown', '2026-01-01')", (user_id,))
+    conn.commit()
+    conn.close()
+
+    init_db()
+
+    # Entradas removidas pela tela não voltam a cada init_db()
+    assert suppressed(db) == {}
+
+
+class RefusingEmailSender:
+    def __init__(self, refusals):
+        self.refusals = refusals
+        self.sent_to = []
+
+    def send(self, to, subject, body):
+        self.sent_to.append(to)
+        return (False, self.refusals[to]) if to in self.refusals else (True, "Sent")
+
+
+def test_send_suppresses_permanent_refusals_and_skips_them_next_time(db):
+    conn = db.get_conn()
+    for name in ("ana", "bruno", "carla"):
+        user_id = add_user(conn, name, f"{name}@example.org")
+        conn.execute("INSERT INTO reminders (user_id, title, remind_at, channel) VALUES (?, 't', '2026-10-19 08:00', 'email')", (user_id,))
+    conn.commit()
+    conn.close()
+
+    sender = RefusingEmailSender({"ana@example.org": "550 5.1.1 User unknown", "bruno@example.org": "550 5.7.1 Relaying denied"})
+    summary = process_reminders({}, now=NOW, email_sender=sender, wa_sender=FakeWhatsAppSender())
+    assert (summary["sent"], summary["failed"]) == (1, 2)
+    assert set(suppressed(db)) == {("email", "ana@example.org")}
+
+    # Nova rodada com os três pendentes: a Ana é pulada sem tentativa, o Bruno é tentado de novo
+    conn = db.get_conn()
+    conn.execute("UPDATE reminders SET sent = 0")
+    conn.commit()
+    conn.close()
+    sender.sent_to.clear()
+    outcomes = {}
+    process_reminders({}, now=NOW, email_sender=sender, wa_sender=FakeWhatsAppSender(), on_result=lambda e: outcomes.setdefault(e["user_id"], e["outcome"]))
+
+    assert sorted(sender.sent_to) == ["bruno@example.org", "carla@example.org"]
+    assert outcomes == {1: "skipped", 2: "failed", 3: "sent"}